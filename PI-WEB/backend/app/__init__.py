@@ -1,10 +1,31 @@
-from flask import Flask
+from flask import Flask, request
 from .routes import routes  # Import the routes blueprint
+from .artifacts import build_artifacts_command
+from .dataset import append_responses_command, import_dataset_command
+from .trainer import TRAINER
+from .metrics import configure_logging
 
-def create_app():
+def create_app(start_trainer=True):
     """
     Factory function to create and configure the Flask app.
+
+    Args:
+        start_trainer: Start the background trainer, which loads the models, on the first
+            request, so that the CLI commands and the reloader process of the dev server, which
+            serve none, do not train. The request does not wait for the models. The pre-fork
+            server (serve.py) disables it and trains in its master process instead.
     """
+    configure_logging()  # Level from PIWEB_LOG_LEVEL
     app = Flask(__name__)
     app.register_blueprint(routes)  # Register the routes blueprint
+    app.cli.add_command(build_artifacts_command)  # flask build-artifacts
+    app.cli.add_command(import_dataset_command)  # flask import-dataset
+    app.cli.add_command(append_responses_command)  # flask append-responses FILE
+    if start_trainer:
+        @app.before_request
+        def start_trainer_thread():
+            # The liveness probe stays independent of the models. /readyz does start the
+            # trainer: a deployment gated on readiness sends no other request until then
+            if request.endpoint != 'routes.healthz':
+                TRAINER.start()  # Load or train the models, then watch the dataset in the background
     return app
@@ -0,0 +1,124 @@
+import json
+import logging
+import os
+
+import click
+import numpy as np
+
+from .dataset import BASE_DIR, DATASET
+from .inference import MODEL_TYPES
+from .training import training_settings
+
+logger = logging.getLogger(__name__)
+
+# Directory holding the exported models
+ARTIFACTS_DIR = os.environ.get('PIWEB_ARTIFACTS_DIR', os.path.join(BASE_DIR, 'artifacts'))
+
+# Bump whenever the training code or the exported arrays change, to invalidate old artifacts
+ARTIFACT_FORMAT = 4
+
+
+def artifact_path(name, fingerprint):
+    """
+    Returns the artifact file path of a model for a dataset fingerprint.
+    """
+    return os.path.join(ARTIFACTS_DIR, f"{name}-{fingerprint[:16]}-v{ARTIFACT_FORMAT}.npz")
+
+
+def save_artifact(name, fingerprint, model):
+    """
+    Saves the arrays of an exported model (see inference.py) as a .npz file, next to the
+    metadata identifying what it was trained on (dataset and training settings). No pickle is
+    involved: loading needs neither scikit-learn nor joblib.
+    The file is written to a temporary path and renamed, so readers never see a partial file.
+    """
+    os.makedirs(ARTIFACTS_DIR, exist_ok=True)
+    path = artifact_path(name, fingerprint)
+    metadata = {
+        "name": name,
+        "format": ARTIFACT_FORMAT,
+        "fingerprint": fingerprint,
+        "type": type(model).__name__,
+        "settings": training_settings(),
+    }
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'wb') as f:
+        np.savez(f, metadata=np.array(json.dumps(metadata)), **model.to_arrays())
+    os.replace(tmp_path, path)
+    return path
+
+
+def load_artifact(name, fingerprint):
+    """
+    Loads a model artifact if one exists for this dataset fingerprint, artifact format and
+    training settings. Returns None otherwise.
+    """
+    path = artifact_path(name, fingerprint)
+    if not os.path.exists(path):
+        return None
+    try:
+        with np.load(path, allow_pickle=False) as data:
+            metadata = json.loads(str(data["metadata"]))
+            arrays = {key: data[key] for key in data.files if key != "metadata"}
+    except Exception as e:
+        logger.error(f"Unreadable model artifact {path}: {e}")
+        return None
+
+    if (metadata.get("format") != ARTIFACT_FORMAT
+            or metadata.get("fingerprint") != fingerprint
+            or metadata.get("settings") != training_settings()
+            or metadata.get("type") not in MODEL_TYPES):
+        logger.info(f"Stale model artifact ignored: {path}")
+        return None
+    return MODEL_TYPES[metadata["type"]].from_arrays(arrays)
+
+
+def load_or_train(name, train, fingerprint=None):
+    """
+    Returns the model stored for the dataset fingerprint, training and saving it on a mismatch.
+
+    Args:
+        name: Artifact name, e.g. 'expense_model'.
+        train: Function without arguments returning a freshly trained model.
+        fingerprint: Dataset fingerprint. Defaults to the version of the shared dataset.
+    """
+    if fingerprint is None:
+        fingerprint = DATASET.version
+
+    model = load_artifact(name, fingerprint)
+    if model is not None:
+        return model
+
+    logger.info(f"Training {name} for dataset {fingerprint[:16]}")
+    model = train()
+    try:
+        save_artifact(name, fingerprint, model)
+    except OSError as e:
+        # A read-only deployment can still serve the freshly trained model
+        logger.error(f"Could not save model artifact {name}: {e}")
+    return model
+
+
+@click.command('build-artifacts')
+@click.option('--force', is_flag=True, help='Retrain even if artifacts already exist.')
+def build_artifacts_command(force):
+    """
+    Train the expense and region models on the current dataset and save them as artifacts.
+
+    Run before deployment so that workers only load the files:
+
+        flask --app run build-artifacts
+    """
+    from .utils import train_expense_model, train_region_model, get_raw_data
+
+    fingerprint = DATASET.version
+    builders = {
+        'expense_model': lambda: train_expense_model(get_raw_data()),
+        'region_model': lambda: train_region_model(DATASET.get()),
+    }
+    for name, train in builders.items():
+        if not force and load_artifact(name, fingerprint) is not None:
+            click.echo(f"{name}: up to date ({artifact_path(name, fingerprint)})")
+            continue
+        path = save_artifact(name, fingerprint, train())
+        click.echo(f"{name}: built {path}")
@@ -0,0 +1,181 @@
+import os
+import queue
+import threading
+import time
+
+import numpy as np
+
+from .executor import REQUEST_TIMEOUT, Overloaded, RequestTimeout
+from .metrics import BATCH_SIZE, BATCH_WAIT
+from .utils import predict_expenses_batch
+
+# Coalesce the concurrent /submit predictions into batches (opt-in)
+BATCH_SUBMIT = os.environ.get('PIWEB_BATCH_SUBMIT', '0') == '1'
+
+# Longest wait for more rows after the first one of a batch, in milliseconds
+BATCH_WINDOW_MS = float(os.environ.get('PIWEB_BATCH_WINDOW_MS', '0.5'))
+
+# Largest batch, in rows
+BATCH_MAX_SIZE = int(os.environ.get('PIWEB_BATCH_MAX_SIZE', '64'))
+
+# Rows waiting for a batch: beyond this, requests are rejected with a 429
+BATCH_MAX_PENDING = int(os.environ.get('PIWEB_BATCH_MAX_PENDING', '1024'))
+
+
+class _Pending:
+    __slots__ = ('key', 'args', 'enqueued', 'done', 'result', 'error')
+
+    def __init__(self, key, args):
+        self.key = key
+        self.args = args
+        self.enqueued = time.perf_counter()
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class MicroBatcher:
+    """
+    Coalesces concurrent single-row calls into one vectorized call.
+
+    Request threads enqueue their row and wait. A background thread takes the first waiting
+    row, gathers the rows arriving within `window` seconds of it (at most `max_size`), calls
+    `predict_rows(key, rows)` once per key (the model the rows were submitted with, so rows
+    from both sides of a model swap are never mixed) and hands each result back to its thread.
+    If a batch fails, its rows are retried one by one, so that an invalid row (an unknown
+    region) fails alone.
+
+    The gain is the per-call overhead shared by the whole batch; the cost is the wait, at most
+    `window` for the first row of a batch. It only pays off with concurrent request threads:
+    the dev server, or serve.py --threaded. With the NumPy ExpenseModel a single prediction
+    already costs ~30 µs: 32 threads on one core reach ~32k predictions/s direct, ~33k with
+    a 0.5 ms window (batches of ~31 rows) and ~12.5k with 2 ms, where the window dominates.
+    """
+
+    def __init__(self, name, predict_rows, window=BATCH_WINDOW_MS / 1000, max_size=BATCH_MAX_SIZE,
+                 max_pending=BATCH_MAX_PENDING, timeout=REQUEST_TIMEOUT):
+        self.name = name
+        self.predict_rows = predict_rows
+        self.window = window
+        self.max_size = max(max_size, 1)
+        self.max_pending = max_pending
+        self.timeout = timeout
+        self._lock = threading.Lock()
+        self._queue = None
+        self._pid = None
+        self.batches = 0
+        self.rows = 0
+        self.fallbacks = 0
+        self.rejected = 0
+        self.timeouts = 0
+
+    def _start(self):
+        """
+        Starts the batching thread of this process. Threads do not survive a fork, so a
+        forked worker starts its own on its first call.
+        """
+        with self._lock:
+            if self._pid != os.getpid():
+                self._queue = queue.Queue(self.max_pending)
+                threading.Thread(target=self._loop, args=(self._queue,), name=f"piweb-batch-{self.name}",
+                                 daemon=True).start()
+                self._pid = os.getpid()
+            return self._queue
+
+    def submit(self, key, *args, timeout=None):
+        """
+        Queues one row and returns its result once its batch ran.
+        Raises Overloaded if too many rows are waiting and RequestTimeout if the result takes too long.
+        """
+        item = _Pending(key, args)
+        try:
+            self._start().put_nowait(item)
+        except queue.Full:
+            with self._lock:
+                self.rejected += 1
+            raise Overloaded(f"Too many pending '{self.name}' predictions, retry later.") from None
+
+        if not item.done.wait(self.timeout if timeout is None else timeout):
+            with self._lock:
+                self.timeouts += 1
+            raise RequestTimeout(f"The '{self.name}' prediction timed out.")
+        if item.error is not None:
+            raise item.error
+        return item.result
+
+    def _loop(self, pending):
+        while True:
+            batch = [pending.get()]
+            deadline = batch[0].enqueued + self.window
+            while len(batch) < self.max_size:
+                remaining = deadline - time.perf_counter()
+                try:
+                    batch.append(pending.get(timeout=remaining) if remaining > 0 else pending.get_nowait())
+                except queue.Empty:
+                    break
+            self._run(batch)
+
+    def _run(self, batch):
+        # One call per model, in arrival order
+        groups = {}
+        for item in batch:
+            groups.setdefault(id(item.key), []).append(item)
+
+        for items in groups.values():
+            started = time.perf_counter()
+            for item in items:
+                BATCH_WAIT.observe(started - item.enqueued, batcher=self.name)
+            BATCH_SIZE.observe(len(items), batcher=self.name)
+            try:
+                results = self.predict_rows(items[0].key, [item.args for item in items])
+            except Exception:
+                # Retry the rows alone, so that only the invalid ones fail
+                with self._lock:
+                    self.fallbacks += 1
+                results = []
+                for item in items:
+                    try:
+                        results.append(self.predict_rows(item.key, [item.args])[0])
+                    except Exception as e:
+                        results.append(e)
+
+            with self._lock:
+                self.batches += 1
+                self.rows += len(items)
+            for item, result in zip(items, results):
+                if isinstance(result, Exception):
+                    item.error = result
+                else:
+                    item.result = result
+                item.done.set()
+
+    def stats(self):
+        """
+        Returns the batching settings and counters.
+        """
+        with self._lock:
+            return {
+                "window": self.window,
+                "max_size": self.max_size,
+                "batches": self.batches,
+                "rows": self.rows,
+                "fallbacks": self.fallbacks,
+                "rejected": self.rejected,
+                "timeouts": self.timeouts,
+            }
+
+
+def predict_expense_rows(model, rows):
+    """
+    Predicts the expenses of many predict_expenses argument tuples (salary, region, family
+    status, target percentage, spending preferences) in one predict_expenses_batch call.
+    Returns one (expenses, remaining balance) pair per row.
+    """
+    salaries, regions, family_statuses, target_percentages, spending_preferences = zip(*rows)
+    expenses, remaining_balances = predict_expenses_batch(
+        model, salaries, regions, family_statuses, target_percentages, np.array(spending_preferences)
+    )
+    return list(zip(expenses, remaining_balances))
+
+
+SUBMIT_BATCHER = MicroBatcher('submit', predict_expense_rows)
@@ -0,0 +1,123 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+
+# Maximum number of entries per cache (0 disables caching)
+CACHE_SIZE = int(os.environ.get('PIWEB_CACHE_SIZE', '4096'))
+
+# Seconds an entry stays valid (0 means no expiry)
+CACHE_TTL = float(os.environ.get('PIWEB_CACHE_TTL', '3600'))
+
+# Salaries are rounded to this precision (in DH) before keying and computing
+SALARY_PRECISION = float(os.environ.get('PIWEB_CACHE_SALARY_PRECISION', '1.0'))
+
+
+def bucket_salary(salary, precision=None):
+    """
+    Rounds a salary to the cache precision, so that nearby salaries share a cache entry.
+    """
+    precision = SALARY_PRECISION if precision is None else precision
+    if precision <= 0:
+        return float(salary)
+    return round(float(salary) / precision) * precision
+
+
+class ResponseCache:
+    """
+    Bounded LRU cache with a TTL, invalidated as a whole when the version changes.
+
+    The version identifies the dataset and model the cached values were computed from:
+    a lookup with a different version clears the cache before computing.
+    """
+
+    def __init__(self, name, max_size=CACHE_SIZE, ttl=CACHE_TTL):
+        self.name = name
+        self.max_size = max_size
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._version = None
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    def get_or_compute(self, key, compute, version=None):
+        """
+        Returns the cached value for `key`, or stores and returns `compute()`.
+        """
+        if self.max_size <= 0:
+            return compute()
+
+        now = time.monotonic()
+        with self._lock:
+            if version != self._version:
+                if self._entries:
+                    self.invalidations += 1
+                self._entries.clear()
+                self._version = version
+
+            entry = self._entries.get(key)
+            if entry is not None:
+                value, expires_at = entry
+                if expires_at is None or expires_at > now:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._entries[key]
+                self.expirations += 1
+            self.misses += 1
+
+        # Compute outside the lock: concurrent misses on the same key may compute twice
+        value = compute()
+
+        with self._lock:
+            if version == self._version:
+                self._entries[key] = (value, now + self.ttl if self.ttl > 0 else None)
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.max_size:
+                    self._entries.popitem(last=False)
+                    self.evictions += 1
+        return value
+
+    def clear(self):
+        """
+        Drops every entry.
+        """
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        """
+        Returns the cache size and counters.
+        """
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "invalidations": self.invalidations,
+            }
+
+
+# Caches in front of the routes
+SUBMIT_CACHE = ResponseCache('submit')
+AVERAGES_CACHE = ResponseCache('display_results')
+DISTRIBUTION_CACHE = ResponseCache('distribution')
+SWEEP_CACHE = ResponseCache('sweep')
+REGION_PROBA_CACHE = ResponseCache('region_probabilities')
+
+
+def cache_stats():
+    """
+    Returns the stats of every response cache, by name.
+    """
+    return {cache.name: cache.stats() for cache in (SUBMIT_CACHE, AVERAGES_CACHE, DISTRIBUTION_CACHE, SWEEP_CACHE, REGION_PROBA_CACHE)}
@@ -0,0 +1,706 @@
+import hashlib
+import hmac
+import json
+import logging
+import os
+import threading
+import time
+
+import click
+import numpy as np
+
+from .metrics import phase
+
+logger = logging.getLogger(__name__)
+
+# Resolve the dataset paths relative to the backend directory, not the working directory
+BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+# Excel workbook: only used as the import source
+SOURCE_PATH = os.environ.get('PIWEB_SOURCE_PATH', os.path.join(BASE_DIR, 'data', 'updated_responses.xlsx'))
+
+# Columnar dataset read by the app: a manifest plus one .npy file per column
+DATASET_PATH = os.environ.get('PIWEB_DATASET_PATH', os.path.join(BASE_DIR, 'data', 'updated_responses.columns', 'manifest.json'))
+
+# Columnar format version, bump when the layout changes. Version 2 stores each column as a
+# list of segments (one per append) and the running aggregates behind the averages.
+COLUMNAR_FORMAT = 2
+READABLE_FORMATS = (1, 2)
+
+# Survey answers stored as parsed floats; every other column is stored as categorical codes
+MONEY_COLUMNS = ['Salaire (DH)', 'Loyer (DH)', 'Factures Mensuelles (DH)', 'Perte Mensuelle Transport (DH)',
+                 'Dépenses Alimentaires (DH)', 'Dépenses Par Repas (DH)']
+
+# Minimum number of seconds between two stat() calls on the dataset file
+CHECK_INTERVAL = float(os.environ.get('PIWEB_DATASET_CHECK_INTERVAL', '1.0'))
+
+# Rows per segment when appending new responses
+APPEND_CHUNK_SIZE = int(os.environ.get('PIWEB_APPEND_CHUNK_SIZE', '10000'))
+
+# Appended segments per column beyond which they are merged into one (see compact_segments)
+COMPACT_SEGMENTS = int(os.environ.get('PIWEB_COMPACT_SEGMENTS', '16'))
+
+# Bearer token required by POST /responses (the route is disabled when unset)
+APPEND_TOKEN = os.environ.get('PIWEB_APPEND_TOKEN')
+
+
+def file_digest(path, chunk_size=1 << 20):
+    """
+    Computes the SHA-256 digest of a file, reading it in chunks.
+    """
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def code_dtype(categories):
+    """
+    Returns the smallest integer type holding the codes of `categories` (and -1 for missing).
+    """
+    return np.int16 if len(categories) < np.iinfo(np.int16).max else np.int32
+
+
+def encode_aggregates(aggregates, columns):
+    """
+    Converts aggregates (see utils.aggregate_survey) into their JSON manifest form.
+    """
+    return {
+        "columns": columns,
+        "groups": [{"region": region, "family_status": status, **value} for (region, status), value in aggregates.items()],
+    }
+
+
+def decode_aggregates(encoded, columns):
+    """
+    Converts aggregates back from their manifest form. Returns None if they are missing or were
+    computed over other columns.
+    """
+    if not encoded or encoded.get("columns") != columns:
+        return None
+    return {
+        (group["region"], group["family_status"]): {key: group[key] for key in ("rows", "sums", "counts")}
+        for group in encoded["groups"]
+    }
+
+
+def read_manifest(manifest_path):
+    with open(manifest_path, encoding='utf-8') as f:
+        manifest = json.load(f)
+    if manifest.get("format") not in READABLE_FORMATS:
+        raise ValueError(f"Unsupported columnar dataset format: {manifest.get('format')}")
+    return manifest
+
+
+def write_manifest(manifest, manifest_path):
+    """
+    Replaces the manifest atomically, so readers always see a complete dataset.
+    """
+    tmp_path = f"{manifest_path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=1)
+    os.replace(tmp_path, manifest_path)
+
+
+def write_columnar(data, manifest_path, source_digest, aggregates=None, sketches=None):
+    """
+    Writes a typed DataFrame as one .npy file per column plus a JSON manifest.
+
+    Numeric columns are stored as they are, other columns as integer codes with their
+    categories in the manifest. Column files are named after the source digest and an import
+    generation, so a re-import never rewrites a file that a reader of the previous manifest
+    may have memory-mapped (which would crash it with a SIGBUS). The manifest is replaced
+    atomically, so readers always see a complete dataset; the files it no longer lists are
+    removed afterwards.
+
+    Args:
+        aggregates: Optional JSON-serializable value stored in the manifest (see
+            encode_aggregates), kept up to date by append_responses.
+        sketches: Same for the quantile sketches (see sketch.encode_sketches).
+    """
+    import pandas as pd
+
+    directory = os.path.dirname(manifest_path)
+    os.makedirs(directory, exist_ok=True)
+    try:
+        generation = read_manifest(manifest_path).get("generation", 0) + 1
+    except (OSError, ValueError):
+        generation = 1  # No dataset yet, or one in a format this version cannot read
+    existing = os.listdir(directory)
+    while any(name.startswith(f"{source_digest[:16]}g{generation}-") for name in existing):
+        generation += 1
+    prefix = f"{source_digest[:16]}g{generation}"
+
+    columns = []
+    for index, name in enumerate(data.columns):
+        series = data[name]
+        file_name = f"{prefix}-{index}.npy"
+        column = {"name": name, "files": [file_name]}
+        if pd.api.types.is_numeric_dtype(series):
+            values = series.to_numpy()
+            column["kind"] = "numeric"
+        else:
+            codes, categories = pd.factorize(series, sort=True)
+            values = codes.astype(code_dtype(categories))
+            column["kind"] = "category"
+            column["categories"] = [str(category) for category in categories]
+        np.save(os.path.join(directory, file_name), values, allow_pickle=False)
+        columns.append(column)
+
+    manifest = {
+        "format": COLUMNAR_FORMAT,
+        "source_digest": source_digest,
+        "generation": generation,
+        "rows": len(data),
+        "segments": 1,
+        "columns": columns,
+        "aggregates": aggregates,
+        "sketches": sketches,
+    }
+    write_manifest(manifest, manifest_path)
+    remove_unreferenced_files(manifest, directory)
+
+
+def file_prefix(manifest):
+    """
+    Returns the prefix of the column files of `manifest` (datasets imported before the
+    generations are named after the source digest only).
+    """
+    if "generation" not in manifest:
+        return manifest["source_digest"][:16]
+    return f"{manifest['source_digest'][:16]}g{manifest['generation']}"
+
+
+def column_files(column):
+    """
+    Returns the segment files of a manifest column, in row order (format 1 has a single file).
+    """
+    return column.get("files", [column.get("file")])
+
+
+def read_column(directory, column, mmap=True):
+    """
+    Returns the stored values of a manifest column: the numbers, or the category codes.
+    """
+    segments = [np.load(os.path.join(directory, file_name), mmap_mode='r' if mmap else None, allow_pickle=False)
+                for file_name in column_files(column)]
+    return segments[0] if len(segments) == 1 else np.concatenate(segments)
+
+
+def read_columnar(manifest_path, mmap=True, categorical=False, columns=None):
+    """
+    Reads a dataset written by write_columnar, or only the given `columns`. Column files are
+    memory-mapped by default.
+
+    Categorical columns are decoded back to strings, like pd.read_excel returns them, or kept
+    as pandas Categoricals with `categorical=True`. Missing values have code -1.
+    Appended segments are concatenated to the first one (which is then no longer memory-mapped).
+    """
+    import pandas as pd  # Only imported by the processes that read the survey
+
+    directory = os.path.dirname(manifest_path)
+    manifest = read_manifest(manifest_path)
+
+    selected = None if columns is None else set(columns)
+    columns = {}
+    for column in manifest["columns"]:
+        if selected is not None and column["name"] not in selected:
+            continue
+        values = read_column(directory, column, mmap)
+        if column["kind"] == "category" and categorical:
+            values = pd.Categorical.from_codes(values, categories=column["categories"])
+        elif column["kind"] == "category":
+            # Object strings with real NaN for the missing-value code -1, as pd.read_excel returns
+            # them: a 'str' array turns NaN into the string 'nan' before pandas 3
+            labels = np.array(column["categories"] + [np.nan], dtype=object)
+            values = labels[values]
+        columns[column["name"]] = values
+    return pd.DataFrame(columns, copy=False)
+
+
+def import_dataframe(data, target, source_digest):
+    """
+    Cleans a raw survey DataFrame and writes it as the columnar dataset.
+
+    The monetary answers are parsed once here (see utils.parse_currency_series); unparseable
+    answers become 0.0 and missing answers stay NaN, as in the per-request cleaning. The sums
+    and counts behind the averages, and the quantile sketches behind the distributions, are
+    computed at the same time and stored with the dataset.
+    """
+    from .sketch import encode_sketches, sketch_survey
+    from .utils import AVERAGE_COLUMNS, DISTRIBUTION_COLUMNS, aggregate_survey, clean_survey_data
+
+    data = clean_responses(data)
+    cleaned = clean_survey_data(data.copy())
+    aggregates = encode_aggregates(aggregate_survey(cleaned), list(AVERAGE_COLUMNS.values()))
+    distribution_columns = list(DISTRIBUTION_COLUMNS.values())
+    sketches = encode_sketches(sketch_survey(cleaned, distribution_columns), distribution_columns)
+    write_columnar(data, target, source_digest, aggregates, sketches)
+    return len(data)
+
+
+def clean_responses(data):
+    """
+    Returns a copy of raw survey responses with stripped column names and parsed monetary answers.
+    """
+    from .utils import parse_currency_series
+
+    data = data.copy()
+    data.columns = data.columns.str.strip()  # Supprime les espaces inutiles dans les noms de colonnes
+    for col in MONEY_COLUMNS:
+        if col in data.columns:
+            data[col] = parse_currency_series(data[col])
+    return data
+
+
+class InvalidResponses(ValueError):
+    """
+    Raised when appended responses cannot be used for training (answered with a 400).
+    """
+
+
+def check_responses(data, start=0):
+    """
+    Raises InvalidResponses if a response has no region, or no family status the region model
+    knows (see inference.QDA_FAMILY_STATUS_MAPPING), naming the indexes of the first ones
+    (counted from `start`, for a chunk of a larger file).
+    """
+    from .inference import QDA_FAMILY_STATUS_MAPPING
+
+    columns = {name.strip(): name for name in data.columns}
+    missing = [name for name in ('Région', 'Situation Familiale') if name not in columns]
+    if missing:
+        raise InvalidResponses(f"Missing survey columns: {missing}")
+
+    regions = data[columns['Région']]
+    statuses = data[columns['Situation Familiale']]
+    invalid = (regions.isna() | (regions.astype(str).str.strip() == '')
+               | ~statuses.astype(str).str.strip().isin(QDA_FAMILY_STATUS_MAPPING) | statuses.isna())
+    if invalid.any():
+        indexes = start + np.flatnonzero(invalid.to_numpy())
+        raise InvalidResponses(
+            f"{len(indexes)} responses without a region or a valid family status "
+            f"(at index {', '.join(map(str, indexes[:10].tolist()))}{', ...' if len(indexes) > 10 else ''})"
+        )
+
+
+class append_lock:
+    """
+    Serializes the appends to a dataset across threads and processes (advisory file lock).
+    """
+
+    _thread_lock = threading.Lock()
+
+    def __init__(self, manifest_path):
+        self.path = f"{manifest_path}.lock"
+        self._file = None
+
+    def __enter__(self):
+        self._thread_lock.acquire()
+        try:
+            import fcntl
+        except ImportError:
+            return self  # No cross-process lock on this platform
+        self._file = open(self.path, 'w')
+        fcntl.flock(self._file, fcntl.LOCK_EX)
+        return self
+
+    def __exit__(self, *exc_info):
+        if self._file is not None:
+            self._file.close()  # Releases the file lock
+            self._file = None
+        self._thread_lock.release()
+
+
+def append_segment(manifest, directory, data):
+    """
+    Writes `data` as a new segment of every column of `manifest` (updated in place, not saved).
+    Columns missing from `data` are filled with missing values, extra columns are ignored.
+    """
+    import pandas as pd
+
+    segment = manifest.get("segments", 1)
+    prefix = file_prefix(manifest)
+    for index, column in enumerate(manifest["columns"]):
+        name = column["name"]
+        series = data[name] if name in data.columns else pd.Series([None] * len(data), index=data.index, dtype=object)
+        if column["kind"] == "numeric":
+            existing = np.load(os.path.join(directory, column_files(column)[0]), mmap_mode='r')
+            values = pd.to_numeric(series, errors='coerce').to_numpy(dtype=float)
+            if existing.dtype.kind == 'f' or not np.isnan(values).any():
+                values = values.astype(existing.dtype)
+        else:
+            # Known answers keep their code, new ones are appended to the categories
+            local_codes, uniques = pd.factorize(series.astype(object).where(series.notna(), None))
+            index_of = {category: code for code, category in enumerate(column["categories"])}
+            mapping = []
+            for category in map(str, uniques):
+                if category not in index_of:
+                    index_of[category] = len(column["categories"])
+                    column["categories"].append(category)
+                mapping.append(index_of[category])
+            mapping = np.append(np.asarray(mapping, dtype=np.int64), -1)  # Code -1 stays missing
+            values = mapping[local_codes].astype(code_dtype(column["categories"]))
+
+        file_name = f"{prefix}-{index}-{segment}.npy"
+        np.save(os.path.join(directory, file_name), values, allow_pickle=False)
+        legacy_file = column.pop("file", None)  # Format 1: a single file per column
+        column["files"] = column.get("files", [legacy_file]) + [file_name]
+
+    manifest["segments"] = segment + 1
+    manifest["rows"] += len(data)
+
+
+def remove_unreferenced_files(manifest, directory):
+    """
+    Removes the column files of `directory` that `manifest` no longer lists, once it is written
+    (open memory maps stay valid).
+    """
+    referenced = {file_name for column in manifest["columns"] for file_name in column_files(column)}
+    for file_name in os.listdir(directory):
+        if file_name.endswith('.npy') and file_name not in referenced:
+            os.remove(os.path.join(directory, file_name))
+
+
+def compact_segments(manifest, directory, max_segments=COMPACT_SEGMENTS):
+    """
+    Merges the appended segments of every column of `manifest` into one new segment once there
+    are more than `max_segments` of them (updated in place, not saved). Returns True if it did.
+
+    Single-row appends (POST /responses) would otherwise add one file per column each: after a
+    thousand of them, reading the dataset opens thirteen thousand files. The first segment, the
+    imported survey, is kept as it is, so a compaction costs O(appended rows), and the merged
+    segment gets a new file name, so readers of the previous manifest keep valid files.
+    """
+    if len(column_files(manifest["columns"][0])) - 1 <= max(max_segments, 1):
+        return False
+
+    segment = manifest.get("segments", 1)
+    prefix = file_prefix(manifest)
+    for index, column in enumerate(manifest["columns"]):
+        files = column_files(column)
+        values = np.concatenate([np.load(os.path.join(directory, file_name), allow_pickle=False)
+                                 for file_name in files[1:]])
+        if column["kind"] == "category":
+            values = values.astype(code_dtype(column["categories"]))
+        file_name = f"{prefix}-{index}-{segment}.npy"
+        np.save(os.path.join(directory, file_name), values, allow_pickle=False)
+        column.pop("file", None)
+        column["files"] = [files[0], file_name]
+    manifest["segments"] = segment + 1
+    return True
+
+
+def append_responses(responses, manifest_path=DATASET_PATH, chunk_size=APPEND_CHUNK_SIZE):
+    """
+    Appends new survey responses to the columnar dataset, in chunks.
+
+    Each chunk goes through the import cleaning, is written as a new segment of every column,
+    and its sums and counts, and its quantile sketches, are merged into those stored in the
+    manifest: the cost is O(new rows), the history is neither re-read nor re-parsed. The manifest is replaced once
+    per chunk, so the app picks the new version up within PIWEB_DATASET_CHECK_INTERVAL seconds
+    and the background trainer refits the models on it.
+
+    Args:
+        responses: DataFrame or list of dicts, keyed by the survey column names.
+
+    Returns:
+        The number of appended rows.
+
+    Raises:
+        InvalidResponses: If a response has no region or family status (see check_responses).
+            Nothing is appended then.
+    """
+    import pandas as pd
+    from .sketch import decode_sketches, encode_sketches, merge_sketches, sketch_survey
+    from .utils import AVERAGE_COLUMNS, DISTRIBUTION_COLUMNS, aggregate_survey, clean_survey_data, merge_aggregates
+
+    data = responses if isinstance(responses, pd.DataFrame) else pd.DataFrame.from_records(responses)
+    if data.empty:
+        return 0
+    check_responses(data)
+
+    directory = os.path.dirname(manifest_path)
+    average_columns = list(AVERAGE_COLUMNS.values())
+    distribution_columns = list(DISTRIBUTION_COLUMNS.values())
+    with append_lock(manifest_path):
+        manifest = read_manifest(manifest_path)
+        known = [column["name"] for column in manifest["columns"]]
+        unknown = [name for name in data.columns.str.strip() if name not in known]
+        if unknown:
+            logger.warning(f"Ignoring unknown survey columns: {unknown}")
+
+        for start in range(0, len(data), max(chunk_size, 1)):
+            chunk = clean_responses(data.iloc[start:start + chunk_size])
+            append_segment(manifest, directory, chunk)
+
+            # Datasets imported without aggregates or sketches keep computing them in full
+            aggregates = decode_aggregates(manifest.get("aggregates"), average_columns)
+            sketches = decode_sketches(manifest.get("sketches"), distribution_columns)
+            if aggregates is not None or sketches is not None:
+                cleaned = clean_survey_data(chunk.reindex(columns=known))
+            if aggregates is not None:
+                delta = aggregate_survey(cleaned)
+                manifest["aggregates"] = encode_aggregates(merge_aggregates(aggregates, delta), average_columns)
+            if sketches is not None:
+                accuracy = manifest["sketches"]["relative_accuracy"]
+                delta = sketch_survey(cleaned, distribution_columns, accuracy)
+                manifest["sketches"] = encode_sketches(merge_sketches(sketches, delta), distribution_columns, accuracy)
+
+            manifest["format"] = COLUMNAR_FORMAT
+            compacted = compact_segments(manifest, directory, COMPACT_SEGMENTS)
+            write_manifest(manifest, manifest_path)
+            if compacted:
+                remove_unreferenced_files(manifest, directory)
+    return len(data)
+
+
+def import_workbook(source=SOURCE_PATH, target=DATASET_PATH):
+    """
+    Converts the Excel workbook into the cleaned, typed columnar dataset.
+
+    Returns:
+        The number of imported rows.
+    """
+    import pandas as pd
+
+    return import_dataframe(pd.read_excel(source), target, file_digest(source))
+
+
+@click.command('append-responses')
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--chunk-size', default=APPEND_CHUNK_SIZE, show_default=True, help='Rows per appended segment.')
+def append_responses_command(path, chunk_size):
+    """
+    Append the survey responses of a CSV or Excel file to the dataset.
+
+    CSV files are streamed in chunks, all of them checked before the first one is appended:
+
+        flask --app run append-responses new_responses.csv
+    """
+    import pandas as pd
+
+    start = time.perf_counter()
+    try:
+        if path.lower().endswith('.csv'):
+            # A bad row in a later chunk must not leave the earlier ones appended
+            for index, chunk in enumerate(pd.read_csv(path, chunksize=chunk_size)):
+                check_responses(chunk, start=index * chunk_size)
+            rows = sum(append_responses(chunk, DATASET.path, chunk_size)
+                       for chunk in pd.read_csv(path, chunksize=chunk_size))
+        else:
+            rows = append_responses(pd.read_excel(path), DATASET.path, chunk_size)
+    except InvalidResponses as e:
+        raise click.ClickException(str(e))
+    click.echo(f"Appended {rows} rows to {DATASET.path} in {time.perf_counter() - start:.2f}s")
+
+
+def check_append_token(header):
+    """
+    Returns True if an Authorization header carries the append token.
+    """
+    if not APPEND_TOKEN or not header:
+        return False
+    return hmac.compare_digest(header.encode(), f"Bearer {APPEND_TOKEN}".encode())
+
+
+@click.command('import-dataset')
+@click.option('--source', default=SOURCE_PATH, show_default=True, help='Excel workbook to import.')
+def import_dataset_command(source):
+    """
+    Convert the survey workbook into the columnar dataset read by the app.
+
+        flask --app run import-dataset
+    """
+    start = time.perf_counter()
+    rows = import_workbook(source, DATASET_PATH)
+    click.echo(f"Imported {rows} rows into {DATASET_PATH} in {time.perf_counter() - start:.2f}s")
+
+
+class DatasetCache:
+    """
+    Keeps the parsed survey dataset in memory and reloads it only when the file changes.
+
+    The file is stat()ed at most once per `check_interval` seconds. A changed mtime triggers a
+    content hash, which is the dataset version; the dataset is re-read only if the hash
+    differs from the loaded version, and only when the data is actually requested. Values
+    derived from the dataset (cleaned frames, aggregates, models) are memoized per version
+    through `derived()` and dropped automatically on change. A missing dataset is created
+    with `importer(target=path)`, if an importer is given.
+    """
+
+    def __init__(self, path=DATASET_PATH, check_interval=CHECK_INTERVAL, reader=read_columnar, importer=None):
+        self.path = path
+        self.check_interval = check_interval
+        self.reader = reader
+        self.importer = importer
+        self._lock = threading.RLock()
+        self._data = None
+        self._mtime = None
+        self._version = None
+        self._last_check = 0.0
+        self._derived = {}
+        self.hits = 0
+        self.misses = 0
+        self.reloads = 0
+
+    def _check(self):
+        """
+        Updates the dataset version from the file on disk, without parsing it.
+        Drops the parsed frame and the derived values if the content changed.
+        Must be called with the lock held.
+        """
+        now = time.monotonic()
+        if self._version is not None and now - self._last_check < self.check_interval:
+            return
+        self._last_check = now
+
+        if self.importer is not None and not os.path.exists(self.path):
+            logger.info(f"Dataset not found, importing it: {self.path}")
+            self.importer(target=self.path)
+
+        mtime = os.stat(self.path).st_mtime_ns
+        if mtime == self._mtime:
+            return
+        self._mtime = mtime
+
+        version = file_digest(self.path)
+        if version == self._version:
+            # File touched but content unchanged: keep the parsed frame
+            return
+
+        if self._version is not None:
+            logger.info(f"Dataset changed on disk: {self.path}")
+        self._version = version
+        self._data = None
+        self._derived = {}
+
+    def get(self):
+        """
+        Returns the raw parsed dataset. The frame is shared: callers must not modify it in place.
+        """
+        with self._lock:
+            self._check()
+            if self._data is not None:
+                self.hits += 1
+                return self._data
+
+            if self.misses == 0:
+                self.misses += 1
+            else:
+                self.reloads += 1
+
+            with phase('load'):
+                self._data = self.reader(self.path)
+            return self._data
+
+    def snapshot(self):
+        """
+        Returns (version, raw parsed dataset) read together, so that the data is the one the
+        version identifies even if the file changes meanwhile. The frame is shared, as with get().
+        """
+        with self._lock:
+            data = self.get()
+            return self._version, data
+
+    @property
+    def version(self):
+        """
+        Returns the content hash of the dataset file. Does not parse the file.
+        """
+        with self._lock:
+            self._check()
+            return self._version
+
+    def derived(self, name, builder):
+        """
+        Returns `builder()` memoized for the current dataset version.
+
+        The builder runs outside the lock, so that a slow build (e.g. reading the dataset)
+        does not block the version checks and the other values meanwhile.
+        """
+        with self._lock:
+            version = self.version
+            if name in self._derived:
+                return self._derived[name]
+
+        # Concurrent misses on the same name may build twice: the first stored value is kept
+        value = builder()
+
+        with self._lock:
+            if self._version != version:
+                # The dataset changed while building: do not cache a stale value
+                return value
+            return self._derived.setdefault(name, value)
+
+    def release(self):
+        """
+        Drops the parsed frame but keeps the version and the derived values. The frame is
+        read again if it is requested, e.g. to retrain after a change.
+        """
+        with self._lock:
+            self._data = None
+
+    def recheck(self):
+        """
+        Makes the next access check the file on disk, e.g. right after an append.
+        """
+        with self._lock:
+            self._last_check = 0.0
+
+    def switch(self, path):
+        """
+        Points the cache to another dataset file. The next access checks and reloads it.
+        """
+        with self._lock:
+            self.path = path
+            self._mtime = None
+            self._last_check = 0.0
+            self._version = None
+            self._data = None
+            self._derived = {}
+
+    def stats(self):
+        """
+        Returns the cache counters and the currently loaded version.
+        """
+        with self._lock:
+            return {
+                "path": self.path,
+                "version": self._version,
+                "rows": None if self._data is None else len(self._data),
+                "hits": self.hits,
+                "misses": self.misses,
+                "reloads": self.reloads,
+            }
+
+
+# Shared dataset cache used by the routes and the model setup. The columnar dataset is
+# imported from the workbook on first use if it does not exist yet.
+DATASET = DatasetCache(importer=import_workbook)
+
+
+def get_raw_data():
+    """
+    Returns a private copy of the raw survey dataset, safe to modify in place.
+    """
+    return DATASET.get().copy()
+
+
+def get_survey_aggregates(columns):
+    """
+    Returns the aggregates stored with the current dataset version (see append_responses),
+    or None if the dataset was written without them or over other columns.
+    """
+    return DATASET.derived('aggregates', lambda: decode_aggregates(read_manifest(DATASET.path).get("aggregates"), columns))
+
+
+def get_survey_sketches(columns):
+    """
+    Returns the quantile sketches stored with the current dataset version (see
+    append_responses), or None if the dataset was written without them or over other columns.
+    """
+    from .sketch import decode_sketches
+
+    return DATASET.derived('sketches', lambda: decode_sketches(read_manifest(DATASET.path).get("sketches"), columns))
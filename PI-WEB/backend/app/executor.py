@@ -0,0 +1,116 @@
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+
+from flask import copy_current_request_context, has_request_context
+
+from .metrics import profile_in_thread
+
+# Worker threads and queued tasks per pool: beyond both, requests are rejected with a 429
+EXECUTOR_WORKERS = int(os.environ.get('PIWEB_EXECUTOR_WORKERS', '4'))
+EXECUTOR_QUEUE = int(os.environ.get('PIWEB_EXECUTOR_QUEUE', '32'))
+
+# Seconds a request waits for its result before a 504
+REQUEST_TIMEOUT = float(os.environ.get('PIWEB_REQUEST_TIMEOUT', '10'))
+
+# Retry-After sent with the 429 responses, in seconds
+RETRY_AFTER = int(os.environ.get('PIWEB_RETRY_AFTER', '1'))
+
+
+class Rejected(Exception):
+    """
+    A request the executors could not serve. Turned into an HTTP error by the routes.
+    """
+    status = 503
+
+
+class Overloaded(Rejected):
+    status = 429
+
+
+class RequestTimeout(Rejected):
+    status = 504
+
+
+class BoundedExecutor:
+    """
+    Thread pool accepting at most `workers + queue_size` pending tasks.
+
+    Work is submitted without blocking: when every slot is taken the task is rejected with
+    Overloaded, so a burst of slow requests fails fast instead of piling up behind the pool.
+    A task that times out keeps its slot until it actually finishes (threads cannot be
+    interrupted), which keeps the backpressure honest.
+    """
+
+    def __init__(self, name, workers=EXECUTOR_WORKERS, queue_size=EXECUTOR_QUEUE, timeout=REQUEST_TIMEOUT):
+        self.name = name
+        self.workers = workers
+        self.queue_size = queue_size
+        self.timeout = timeout
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix=f"piweb-{name}")
+        self._slots = threading.BoundedSemaphore(workers + queue_size)
+        self._lock = threading.Lock()
+        self.pending = 0
+        self.completed = 0
+        self.rejected = 0
+        self.timeouts = 0
+
+    def _release(self, future):
+        with self._lock:
+            self.pending -= 1
+            self.completed += 1
+        self._slots.release()
+
+    def run(self, fn, *args, timeout=None):
+        """
+        Runs `fn(*args)` on the pool and returns its result, within the request context if any.
+        Raises Overloaded if the pool is full and RequestTimeout if the result takes too long.
+        """
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self.rejected += 1
+            raise Overloaded(f"Too many pending '{self.name}' requests, retry later.")
+
+        if has_request_context():
+            # Keeps the route label of the timings, and the sampled request profile
+            fn = copy_current_request_context(profile_in_thread(fn))
+        with self._lock:
+            self.pending += 1
+        future = self._executor.submit(fn, *args)
+        future.add_done_callback(self._release)
+
+        try:
+            return future.result(self.timeout if timeout is None else timeout)
+        except FutureTimeoutError:
+            future.cancel()  # Frees the slot right away if the task had not started
+            with self._lock:
+                self.timeouts += 1
+            raise RequestTimeout(f"The '{self.name}' request timed out.") from None
+
+    def stats(self):
+        """
+        Returns the pool size and counters.
+        """
+        with self._lock:
+            return {
+                "workers": self.workers,
+                "queue_size": self.queue_size,
+                "timeout": self.timeout,
+                "pending": self.pending,
+                "completed": self.completed,
+                "rejected": self.rejected,
+                "timeouts": self.timeouts,
+            }
+
+
+# Separate pools, so that slow dataset work (map clicks after a dataset change) cannot take
+# the threads of the model predictions
+PREDICT_EXECUTOR = BoundedExecutor('predict')
+DATA_EXECUTOR = BoundedExecutor('data')
+
+
+def executor_stats():
+    """
+    Returns the stats of every executor, by name.
+    """
+    return {executor.name: executor.stats() for executor in (PREDICT_EXECUTOR, DATA_EXECUTOR)}
@@ -0,0 +1,210 @@
+import os
+import random
+
+import numpy as np
+
+# Model classes by name, to rebuild them from their exported arrays (see artifacts.py)
+MODEL_TYPES = {}
+
+# Seed of the region sampling, for reproducible predictions (random when unset)
+SAMPLING_SEED = int(os.environ['PIWEB_SAMPLING_SEED']) if os.environ.get('PIWEB_SAMPLING_SEED') else None
+
+# Generator of the region sampling, rather than the global one any library may draw from.
+# Forked workers reseed it, so that they do not all repeat the sequence of the master
+SAMPLING_RNG = random.Random(SAMPLING_SEED)
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=lambda: SAMPLING_RNG.seed(SAMPLING_SEED))
+
+
+def sample_region(classes, probabilities, rng=None):
+    """
+    Randomly selects one of `classes` weighted by probabilities, with `rng` or SAMPLING_RNG.
+    """
+    return (rng or SAMPLING_RNG).choices(classes, weights=probabilities, k=1)[0]
+
+
+def register_model(cls):
+    MODEL_TYPES[cls.__name__] = cls
+    return cls
+
+
+# Family status answers (stripped) to the categories of the region model
+QDA_FAMILY_STATUS_MAPPING = {
+    'Marié': 'Married',
+    'Mariée': 'Married',
+    'Célibataire': 'Single',
+    'Celibataire': 'Single',
+    'Divorcé': 'Single',
+    'Divorcée': 'Single',
+    'Single': 'Single',
+    'Married': 'Married'
+}
+
+
+def clean_family_status_QDA(family_status):
+    """
+    Normalize family status into consistent categories.
+    """
+    result = QDA_FAMILY_STATUS_MAPPING.get(str(family_status).strip(), None)
+    if result is None:
+        raise ValueError(f"Invalid family status: {family_status}. Must be 'Single' or 'Married'.")
+    return result
+
+
+def encode(values, vocabulary, name):
+    """
+    Returns the index of each value in `vocabulary`, raising a ValueError on unknown values
+    like scikit-learn's encoders do.
+    """
+    index = {value: i for i, value in enumerate(vocabulary)}
+    try:
+        return np.array([index[value] for value in values], dtype=np.intp)
+    except KeyError as e:
+        raise ValueError(f"Found unknown {name}: {e.args[0]!r}") from None
+
+
+@register_model
+class ExpenseModel:
+    """
+    Expense model exported from the scikit-learn pipeline of train_model, served with NumPy only.
+
+    The pipeline scales the salary, one-hot encodes the region and the family status, then
+    applies a LinearRegression. With a single non-zero one-hot column per feature, a prediction
+    is the intercept plus the scaled salary times its coefficient plus the coefficients of the
+    region and the status, added in the same order as scikit-learn's sparse product, so the
+    predictions are identical.
+    """
+
+    def __init__(self, regions, family_statuses, salary_mean, salary_scale, coef, intercept):
+        self.regions = [str(region) for region in regions]
+        self.family_statuses = [str(status) for status in family_statuses]
+        self.salary_mean = float(salary_mean)
+        self.salary_scale = float(salary_scale)
+        self.coef = np.asarray(coef, dtype=float)  # (4, 1 + regions + statuses)
+        self.intercept = np.asarray(intercept, dtype=float)  # (4,)
+
+    def predict(self, salaries, regions, family_statuses):
+        """
+        Returns the predicted expenses, shape (N, 4), for N salaries, regions and statuses.
+        Raises a ValueError on a region or status unseen in training.
+        """
+        salaries = np.asarray(salaries, dtype=float)
+        region_columns = 1 + encode(regions, self.regions, 'region')
+        status_columns = 1 + len(self.regions) + encode(family_statuses, self.family_statuses, 'family status')
+
+        scaled = (salaries - self.salary_mean) / self.salary_scale
+        predicted = 0.0 + scaled[:, np.newaxis] * self.coef[:, 0]
+        predicted += self.coef[:, region_columns].T
+        predicted += self.coef[:, status_columns].T
+        return predicted + self.intercept
+
+    def to_arrays(self):
+        return {
+            "regions": np.asarray(self.regions, dtype=str),
+            "family_statuses": np.asarray(self.family_statuses, dtype=str),
+            "salary_mean": np.float64(self.salary_mean),
+            "salary_scale": np.float64(self.salary_scale),
+            "coef": self.coef,
+            "intercept": self.intercept,
+        }
+
+    @classmethod
+    def from_arrays(cls, arrays):
+        return cls(arrays["regions"].tolist(), arrays["family_statuses"].tolist(), arrays["salary_mean"],
+                   arrays["salary_scale"], arrays["coef"], arrays["intercept"])
+
+
+@register_model
+class RegionModel:
+    """
+    Region model exported from the scikit-learn LabelEncoder, StandardScaler and QDA of
+    train_region_model, served with NumPy only.
+
+    Each region's covariance is kept as scikit-learn stores it, as its eigenvectors (rotations)
+    and eigenvalues (scalings), and the posterior is computed with the same operations as
+    QuadraticDiscriminantAnalysis.predict_proba, so the probabilities are identical.
+    """
+
+    def __init__(self, family_statuses, classes, feature_mean, feature_scale, means, rotations, scalings, priors):
+        self.family_statuses = [str(status) for status in family_statuses]
+        self.classes_ = np.asarray(classes, dtype=object)
+        self.feature_mean = np.asarray(feature_mean, dtype=float)  # (2,): salary, encoded status
+        self.feature_scale = np.asarray(feature_scale, dtype=float)
+        self.means = np.asarray(means, dtype=float)  # (regions, 2)
+        self.rotations = np.asarray(rotations, dtype=float)  # (regions, 2, 2)
+        self.scalings = np.asarray(scalings, dtype=float)  # (regions, 2)
+        self.priors = np.asarray(priors, dtype=float)  # (regions,)
+
+        # Terms of the log posterior that do not depend on the input
+        self._projections = [rotation * (scaling ** (-0.5)) for rotation, scaling in zip(self.rotations, self.scalings)]
+        self._offsets = np.asarray([np.sum(np.log(scaling)) for scaling in self.scalings])
+        self._log_priors = np.log(self.priors)
+
+    def predict_proba_batch(self, salaries, family_status_codes):
+        """
+        Returns the probability of each region in `classes_`, shape (N, regions), for N salaries
+        and encoded family statuses (indexes in `family_statuses`).
+        """
+        features = np.column_stack([np.asarray(salaries, dtype=float),
+                                    np.broadcast_to(np.asarray(family_status_codes, dtype=float), np.shape(salaries))])
+        features = (features - self.feature_mean) / self.feature_scale
+
+        # Log posterior of each region, eq (4.12) p. 110 of the ESL
+        norm2 = np.array([np.sum(np.dot(features - mean, projection) ** 2, axis=1)
+                          for mean, projection in zip(self.means, self._projections)]).T
+        scores = -0.5 * (norm2 + self._offsets) + self._log_priors
+
+        log_likelihood = scores - scores.max(axis=1)[:, np.newaxis]
+        return np.exp(log_likelihood - np.log(np.exp(log_likelihood).sum(axis=1)[:, np.newaxis]))
+
+    def predict_proba(self, salaire, family_status):
+        """
+        Returns the probability of each region in `classes_` for a salary and family status.
+        """
+        family_status = clean_family_status_QDA(family_status)  # Clean input as well
+        code = encode([family_status], self.family_statuses, 'family status')
+        return self.predict_proba_batch([salaire], code)[0]
+
+    def sample(self, probabilities, rng=None):
+        """
+        Randomly selects a region weighted by probabilities, with `rng` or SAMPLING_RNG.
+        """
+        return sample_region(self.classes_, probabilities, rng)
+
+    def to_arrays(self):
+        return {
+            "family_statuses": np.asarray(self.family_statuses, dtype=str),
+            "classes": np.asarray(self.classes_.tolist(), dtype=str),
+            "feature_mean": self.feature_mean,
+            "feature_scale": self.feature_scale,
+            "means": self.means,
+            "rotations": self.rotations,
+            "scalings": self.scalings,
+            "priors": self.priors,
+        }
+
+    @classmethod
+    def from_arrays(cls, arrays):
+        return cls(arrays["family_statuses"].tolist(), arrays["classes"].tolist(), arrays["feature_mean"],
+                   arrays["feature_scale"], arrays["means"], arrays["rotations"], arrays["scalings"], arrays["priors"])
+
+
+def export_expense_model(pipeline):
+    """
+    Flattens the fitted pipeline of train_model into an ExpenseModel.
+    """
+    preprocessor = pipeline.named_steps['preprocessor']
+    scaler = preprocessor.named_transformers_['num']
+    regions, family_statuses = preprocessor.named_transformers_['cat'].categories_
+    regressor = pipeline.named_steps['regressor']
+    return ExpenseModel(regions, family_statuses, scaler.mean_[0], scaler.scale_[0], regressor.coef_, regressor.intercept_)
+
+
+def export_region_model(label_encoder, scaler, qda, regions=None):
+    """
+    Flattens the fitted encoder, scaler and QDA of train_region_model into a RegionModel.
+    `regions` names the QDA classes when it was fitted on region codes.
+    """
+    classes = qda.classes_ if regions is None else np.asarray(regions, dtype=object)[qda.classes_]
+    return RegionModel(label_encoder.classes_, classes, scaler.mean_, scaler.scale_, qda.means_,
+                       np.stack(qda.rotations_), np.stack(qda.scalings_), qda.priors_)
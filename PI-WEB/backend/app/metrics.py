@@ -0,0 +1,242 @@
+import bisect
+import cProfile
+import logging
+import os
+import pstats
+import random
+import threading
+import time
+from contextlib import contextmanager
+
+from flask import g, has_request_context, request
+
+logger = logging.getLogger(__name__)
+
+# Log level of the app loggers (DEBUG logs every request and response payload)
+LOG_LEVEL = os.environ.get('PIWEB_LOG_LEVEL', 'INFO').upper()
+
+# Opt-in profiler: fraction of requests profiled, and the duration above which a profile is kept
+PROFILE_SAMPLE_RATE = float(os.environ.get('PIWEB_PROFILE_SAMPLE_RATE', '0'))
+PROFILE_SLOW_MS = float(os.environ.get('PIWEB_PROFILE_SLOW_MS', '100'))
+PROFILE_DIR = os.environ.get('PIWEB_PROFILE_DIR', os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'profiles'))
+
+# Latency histogram buckets, in seconds
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def configure_logging(level=LOG_LEVEL):
+    """
+    Configures the app loggers with the "[LEVEL] message" format used throughout the app.
+    """
+    logging.basicConfig(format='[%(levelname)s] %(message)s')
+    logging.getLogger('app').setLevel(level)
+
+
+def format_labels(labels):
+    """
+    Formats (name, value) pairs as a Prometheus label set, e.g. {route="submit"}.
+    """
+    if not labels:
+        return ''
+    pairs = []
+    for name, value in labels:
+        value = str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+        pairs.append(f'{name}="{value}"')
+    return '{' + ','.join(pairs) + '}'
+
+
+class Counter:
+    """
+    Monotonic counter with labels, rendered in the Prometheus text format.
+    """
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(labels.get(name, '') for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{format_labels(zip(self.labelnames, key))} {value}")
+        return lines
+
+
+class Histogram:
+    """
+    Histogram with labels, rendered with cumulative buckets in the Prometheus text format.
+    """
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(labels.get(name, '') for name in self.labelnames)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                # Per-bucket counts (the last one is +Inf), then the sum of the observations
+                state = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            state[0][bisect.bisect_left(self.buckets, value)] += 1
+            state[1] += value
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for key, (counts, total) in sorted(self._values.items()):
+                labels = list(zip(self.labelnames, key))
+                cumulative = 0
+                for bound, count in zip(self.buckets + (float('inf'),), counts):
+                    cumulative += count
+                    le = '+Inf' if bound == float('inf') else repr(bound)
+                    lines.append(f"{self.name}_bucket{format_labels(labels + [('le', le)])} {cumulative}")
+                lines.append(f"{self.name}_sum{format_labels(labels)} {total}")
+                lines.append(f"{self.name}_count{format_labels(labels)} {cumulative}")
+        return lines
+
+
+REQUESTS = Counter('piweb_requests_total', 'HTTP requests by route and status.', ('route', 'method', 'status'))
+REQUEST_LATENCY = Histogram('piweb_request_duration_seconds', 'HTTP request latency by route.', ('route', 'method'))
+PHASE_LATENCY = Histogram('piweb_phase_duration_seconds', 'Time spent per processing phase.', ('route', 'phase'))
+PROFILES = Counter('piweb_profiles_total', 'Slow-request profiles written to disk, by route.', ('route',))
+BATCH_SIZE = Histogram('piweb_batch_size', 'Rows per coalesced prediction batch.', ('batcher',),
+                       buckets=(1, 2, 4, 8, 16, 32, 64, 128, 256))
+BATCH_WAIT = Histogram('piweb_batch_wait_seconds', 'Time a row waited for its prediction batch.', ('batcher',),
+                       buckets=(0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1))
+
+METRICS = [REQUESTS, REQUEST_LATENCY, PHASE_LATENCY, PROFILES, BATCH_SIZE, BATCH_WAIT]
+
+# Functions returning extra samples for /metrics: {name: (type, help, [(labels dict, value)])}
+COLLECTORS = []
+
+
+def register_collector(collector):
+    """
+    Registers a function exposing externally tracked values (cache or dataset stats) on /metrics.
+    """
+    COLLECTORS.append(collector)
+    return collector
+
+
+def render_metrics():
+    """
+    Renders every metric and collector in the Prometheus text exposition format.
+    """
+    lines = []
+    for metric in METRICS:
+        lines.extend(metric.render())
+    for collector in COLLECTORS:
+        for name, (kind, documentation, samples) in collector().items():
+            lines.append(f"# HELP {name} {documentation}")
+            lines.append(f"# TYPE {name} {kind}")
+            for labels, value in samples:
+                lines.append(f"{name}{format_labels(sorted(labels.items()))} {float(value)}")
+    return '\n'.join(lines) + '\n'
+
+
+def current_route():
+    """
+    Returns the endpoint of the current request, or 'background' outside of a request.
+    """
+    if has_request_context():
+        return request.endpoint or 'unknown'
+    return 'background'
+
+
+@contextmanager
+def phase(name):
+    """
+    Times a processing phase (load, clean, filter, aggregate, predict, serialize, ...)
+    and records it under the current route.
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        PHASE_LATENCY.observe(time.perf_counter() - start, route=current_route(), phase=name)
+
+
+def _start_request():
+    g.metrics_start = time.perf_counter()
+    g.metrics_profiler = None
+    if PROFILE_SAMPLE_RATE > 0 and random.random() < PROFILE_SAMPLE_RATE:
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+            g.metrics_profiler = profiler
+        except ValueError:
+            pass  # Another profiler is already active in this process
+
+
+def profile_in_thread(fn):
+    """
+    Wraps `fn`, about to run on another thread, so that it is profiled there when the current
+    request is: cProfile only sees the thread that enabled it. The stats are merged into the
+    request profile when it is written.
+    """
+    if not has_request_context() or g.get('metrics_profiler') is None:
+        return fn
+    profiles = g.setdefault('metrics_thread_profiles', [])
+
+    def profiled(*args, **kwargs):
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError:
+            # Another profiler is active: from Python 3.12 the request one sees every thread
+            return fn(*args, **kwargs)
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            profiler.disable()
+            profiles.append(profiler)
+
+    return profiled
+
+
+def _finish_request(response):
+    start = g.pop('metrics_start', None)
+    if start is None:
+        return response
+    elapsed = time.perf_counter() - start
+    route = current_route()
+    REQUESTS.inc(route=route, method=request.method, status=response.status_code)
+    REQUEST_LATENCY.observe(elapsed, route=route, method=request.method)
+
+    profiler = g.pop('metrics_profiler', None)
+    thread_profiles = g.pop('metrics_thread_profiles', [])
+    if profiler is not None:
+        profiler.disable()
+        if elapsed * 1000 >= PROFILE_SLOW_MS:
+            os.makedirs(PROFILE_DIR, exist_ok=True)
+            path = os.path.join(PROFILE_DIR, f"{time.strftime('%Y%m%d-%H%M%S')}-{route}-{int(elapsed * 1000)}ms.prof")
+            # With the work the request ran on the executors (see profile_in_thread)
+            stats = pstats.Stats(profiler)
+            for thread_profile in list(thread_profiles):
+                stats.add(thread_profile)
+            stats.dump_stats(path)
+            PROFILES.inc(route=route)
+            logger.info(f"Slow request profile written: {path}")
+    return response
+
+
+def instrument(blueprint):
+    """
+    Adds request timing, counters and the opt-in slow-request profiler to a blueprint.
+    """
+    blueprint.before_request(_start_request)
+    blueprint.after_request(_finish_request)
+    return blueprint
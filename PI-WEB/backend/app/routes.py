@@ -1,14 +1,34 @@
-from flask import Blueprint, request, jsonify, render_template
-from .utils import REGION_MAPPING, filter_data, calculate_averages, convert_currency_to_avg, predict_region, predict_expenses, setup_model  # Import functions from utils
-import pandas as pd
+from flask import Blueprint, Response, request, jsonify, render_template
+from .utils import REGION_MAPPING, FAMILY_STATUSES, EXPENSE_CATEGORIES, DISTRIBUTION_QUANTILES, HISTOGRAM_BINS, BATCH_MAX_PROFILES, SWEEP_MAX_SALARIES, get_averages_table, lookup_averages, lookup_distributions, predict_region, predict_expenses, predict_expenses_batch, parse_spending_preferences, sweep_expenses  # Import functions from utils
+from .sketch import SKETCH_ACCURACY
+from .dataset import DATASET, InvalidResponses, append_responses, check_append_token
+from .cache import SUBMIT_CACHE, AVERAGES_CACHE, DISTRIBUTION_CACHE, SWEEP_CACHE, bucket_salary, cache_stats
+from .trainer import TRAINER
+from .executor import DATA_EXECUTOR, PREDICT_EXECUTOR, RETRY_AFTER, Overloaded, Rejected, executor_stats
+from .batching import BATCH_SUBMIT, SUBMIT_BATCHER
+from .metrics import instrument, phase, register_collector, render_metrics
 import numpy as np
+import logging
 import os
 
-# Create Flask Blueprint
-routes = Blueprint('routes', __name__)
+logger = logging.getLogger(__name__)
+
+# Create Flask Blueprint, with request timing and the opt-in profiler (see metrics.py)
+routes = instrument(Blueprint('routes', __name__))
+
+
+@routes.errorhandler(Rejected)
+def handle_rejected(e):
+    """
+    Answers requests rejected by the executors: 429 with Retry-After when a pool is full,
+    504 when the work timed out.
+    """
+    response = jsonify({"error": str(e)})
+    response.status_code = e.status
+    if isinstance(e, Overloaded):
+        response.headers['Retry-After'] = str(RETRY_AFTER)
+    return response
 
-# Initialize the model at startup
-MODEL = setup_model()
 
 @routes.route('/')
 def home():
@@ -25,10 +45,22 @@ def budget_planning_tool_route():
     return render_template('budgetPTool.html')
 
 
+def format_expenses(expenses, remaining_balance):
+    """
+    Builds the JSON body of an expense prediction.
+    """
+    return {
+        "expenses": dict(zip(EXPENSE_CATEGORIES, map(lambda x: round(float(x), 2), expenses))),
+        "total_expenses": round(float(sum(expenses)), 2),
+        "remaining_balance": round(float(remaining_balance), 2)
+    }
+
 @routes.route('/submit', methods=['POST'])
 def submit():
-    if not MODEL:
-        return jsonify({"error": "Model not loaded"}), 500
+    # Models are trained in the background and swapped atomically: use one snapshot per request
+    models = TRAINER.current
+    if not models:
+        return jsonify({"error": "Model not loaded"}), 503
 
     try:
         # Get form inputs
@@ -38,28 +70,217 @@ def submit():
         target_percentage = float(request.form['savings'].replace('%', ''))
 
         # Spending preferences
-        preference_mapping = {"high": 1.5, "medium": 1.0, "low": 0.5}
-        spending_preferences = np.array([
-            preference_mapping.get(request.form['rent'].lower(), 1.0),
-            preference_mapping.get(request.form['utilities'].lower(), 1.0),
-            preference_mapping.get(request.form['transport'].lower(), 1.0),
-            preference_mapping.get(request.form['food'].lower(), 1.0)
-        ])
-
-        # Predict expenses
-        expenses, remaining_balance = predict_expenses(
-            MODEL, salary, region, family_status, target_percentage, spending_preferences
+        spending_preferences = parse_spending_preferences(
+            request.form['rent'], request.form['utilities'], request.form['transport'], request.form['food']
+        )
+
+        # Salaries are bucketed so that nearby inputs share a cache entry
+        salary = bucket_salary(salary)
+        cache_key = (salary, region, family_status, target_percentage, tuple(spending_preferences))
+
+        def compute():
+            # Predict expenses
+            expenses, remaining_balance = predict_expenses(
+                models.expense_model, salary, region, family_status, target_percentage, spending_preferences
+            )
+            return format_expenses(expenses, remaining_balance)
+
+        def compute_batched():
+            # Coalesced with the concurrent /submit predictions (see batching.py)
+            expenses, remaining_balance = SUBMIT_BATCHER.submit(
+                models.expense_model, salary, region, family_status, target_percentage, spending_preferences
+            )
+            return format_expenses(expenses, remaining_balance)
+
+        # Cache misses are batched, or run on the prediction pool
+        response_data = SUBMIT_CACHE.get_or_compute(
+            cache_key, compute_batched if BATCH_SUBMIT else lambda: PREDICT_EXECUTOR.run(compute),
+            version=models.version
         )
 
         # Return the results as JSON
-        return jsonify({
-            "expenses": dict(zip(['Rent', 'Utilities', 'Transport', 'Food'], map(lambda x: round(x, 2), expenses))),
-            "total_expenses": round(sum(expenses), 2),
-            "remaining_balance": round(remaining_balance, 2)
-        })
+        with phase('serialize'):
+            return jsonify(response_data)
+    except Rejected:
+        raise
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@routes.route('/submit_batch', methods=['POST'])
+def submit_batch():
+    """
+    Route to predict the expenses of many profiles in one vectorized model call.
+
+    Expects a JSON body {"profiles": [...]} where each profile has the /submit fields:
+    salary, region, family_status, savings, and optionally rent, utilities, transport, food.
+    Returns {"results": [...]} with one /submit-shaped result per profile, in order.
+    At most PIWEB_BATCH_MAX_PROFILES profiles; an invalid profile (unknown region or family
+    status included) is answered with a 400 naming its index.
+    """
+    models = TRAINER.current
+    if not models:
+        return jsonify({"error": "Model not loaded"}), 503
+
+    request_data = request.get_json(silent=True) or {}
+    profiles = request_data.get('profiles')
+    if not isinstance(profiles, list) or not profiles:
+        return jsonify({"error": "Invalid input: 'profiles' must be a non-empty list."}), 400
+    if len(profiles) > BATCH_MAX_PROFILES:
+        return jsonify({"error": f"Invalid input: at most {BATCH_MAX_PROFILES} profiles per request."}), 400
+
+    # Checked up front, so that one bad profile does not fail the whole model call
+    known_regions = set(models.expense_model.regions)
+    known_statuses = set(models.expense_model.family_statuses)
+
+    salaries, regions, family_statuses, target_percentages, spending_preferences = [], [], [], [], []
+    for index, profile in enumerate(profiles):
+        try:
+            salaries.append(float(profile['salary']))
+            regions.append(str(profile['region']))
+            family_statuses.append(str(profile['family_status']))
+            if regions[-1] not in known_regions:
+                raise ValueError(f"unknown region {regions[-1]!r}")
+            if family_statuses[-1] not in known_statuses:
+                raise ValueError(f"unknown family status {family_statuses[-1]!r}")
+            target_percentages.append(float(str(profile.get('savings', 0)).replace('%', '')))
+            spending_preferences.append(parse_spending_preferences(
+                profile.get('rent', 'medium'), profile.get('utilities', 'medium'),
+                profile.get('transport', 'medium'), profile.get('food', 'medium')
+            ))
+        except (KeyError, TypeError, ValueError) as e:
+            return jsonify({"error": f"Invalid profile at index {index}: {e}"}), 400
+
+    try:
+        expenses, remaining_balances = PREDICT_EXECUTOR.run(
+            predict_expenses_batch, models.expense_model, salaries, regions, family_statuses,
+            target_percentages, np.array(spending_preferences)
+        )
+        with phase('serialize'):
+            return jsonify({
+                "results": [format_expenses(row, balance) for row, balance in zip(expenses, remaining_balances)]
+            })
+    except Rejected:
+        raise
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+def format_expense_series(expenses, remaining_balances):
+    """
+    Builds the JSON body of the expense predictions of a salary sweep, one value per salary.
+    """
+    return {
+        "expenses": {category: np.round(expenses[:, i], 2).tolist() for i, category in enumerate(EXPENSE_CATEGORIES)},
+        "total_expenses": np.round(expenses.sum(axis=1), 2).tolist(),
+        "remaining_balance": np.round(remaining_balances, 2).tolist()
+    }
+
+@routes.route('/submit_sweep', methods=['POST'])
+def submit_sweep():
+    """
+    Route to predict the expenses of one profile in every region of REGION_MAPPING at once,
+    in a single vectorized model call.
+
+    Expects a JSON body with the /submit fields: salary, family_status, savings, and optionally
+    rent, utilities, transport, food. With "salary_range": {"min", "max", "step"} instead of
+    "salary", every salary of the range is swept as well (at most PIWEB_SWEEP_MAX_SALARIES).
+
+    Returns {"results": [...]} with one entry per region, in REGION_MAPPING order: a
+    /submit-shaped result, with lists over the salaries for a range, or an error for the
+    regions without data. A single salary also gives the region with the highest remaining
+    balance as "best_region_id".
+    """
+    models = TRAINER.current
+    if not models:
+        return jsonify({"error": "Model not loaded"}), 503
+
+    profile = request.get_json(silent=True) or {}
+    try:
+        salary_range = profile.get('salary_range')
+        if salary_range is None:
+            salaries = (bucket_salary(float(profile['salary'])),)
+        else:
+            low, high, step = (float(salary_range[key]) for key in ('min', 'max', 'step'))
+            if not 0 <= low <= high or step <= 0 or (high - low) / step + 1 > SWEEP_MAX_SALARIES:
+                raise ValueError(f"the salary range must hold between 1 and {SWEEP_MAX_SALARIES} salaries")
+            salaries = tuple(np.round(np.arange(low, high + step / 2, step), 2).tolist())
+        family_status = str(profile['family_status'])
+        if family_status not in FAMILY_STATUSES:
+            raise ValueError(f"family status must be one of {', '.join(FAMILY_STATUSES)}")
+        target_percentage = float(str(profile.get('savings', 0)).replace('%', ''))
+        spending_preferences = parse_spending_preferences(
+            profile.get('rent', 'medium'), profile.get('utilities', 'medium'),
+            profile.get('transport', 'medium'), profile.get('food', 'medium')
+        )
+    except (KeyError, TypeError, ValueError) as e:
+        logger.warning(f"Invalid /submit_sweep input: {e}")
+        return jsonify({"error": f"Invalid input: {e}"}), 400
+
+    model = models.expense_model
+    regions = [region for region in REGION_MAPPING.values() if region in model.regions]
+
+    def compute():
+        expenses, remaining_balances = sweep_expenses(
+            model, salaries, regions, family_status, target_percentage, spending_preferences
+        ) if regions else (None, None)
+
+        results = []
+        for region_id, region_name in REGION_MAPPING.items():
+            result = {"region_id": region_id, "region": region_name}
+            if region_name not in regions:
+                result["error"] = f"No data available for region '{region_name}'."
+            elif salary_range is None:
+                index = regions.index(region_name)
+                result.update(format_expenses(expenses[index, 0], remaining_balances[index, 0]))
+            else:
+                index = regions.index(region_name)
+                result.update(format_expense_series(expenses[index], remaining_balances[index]))
+            results.append(result)
+
+        response_data = {"family_status": family_status, "savings": target_percentage, "results": results}
+        if salary_range is None:
+            response_data["salary"] = salaries[0]
+            if regions:
+                response_data["best_region_id"] = max(
+                    (result for result in results if "error" not in result), key=lambda result: result["remaining_balance"]
+                )["region_id"]
+        else:
+            response_data["salaries"] = list(salaries)
+        return response_data
+
+    try:
+        # One entry per profile and dataset version, computed on the prediction pool
+        response_data = SWEEP_CACHE.get_or_compute(
+            (salaries, family_status, target_percentage, tuple(spending_preferences)),
+            lambda: PREDICT_EXECUTOR.run(compute), version=models.version
+        )
+        with phase('serialize'):
+            return jsonify(response_data)
+    except Rejected:
+        raise
+    except Exception as e:
+        logger.exception(f"Exception in /submit_sweep: {e}")
+        return jsonify({"error": str(e)}), 500
+
+def build_results_response(region_name, family_status):
+    """
+    Builds the /display_results body and status code for a region and family status.
+    """
+    # Averages are precomputed once per dataset version: this is a dictionary lookup
+    averages = lookup_averages(region_name, family_status)
+
+    # Handle case where no data is found
+    if averages is None:
+        logger.debug(f"No data found for region: {region_name}, family status: {family_status}")
+        return {
+            "message": f"No data available for region '{region_name}' and family status '{family_status}'."
+        }, 404
+
+    # Successful response
+    return {
+        "message": f"Results for region '{region_name}' and family status '{family_status}':",
+        "averages": averages
+    }, 200
+
 @routes.route('/display_results', methods=['POST'])
 def display_results():
     """
@@ -68,7 +289,7 @@ def display_results():
     try:
         # Get the JSON data from the request
         request_data = request.get_json()
-        print(f"[INFO] Incoming request data: {request_data}")  # Log the incoming request
+        logger.debug(f"Incoming request data: {request_data}")  # Log the incoming request
         
         # Extract region and family status from the request
         region_id = request_data.get('region')
@@ -76,74 +297,235 @@ def display_results():
 
         # Validate region ID
         if not region_id:
-            print("[ERROR] Region ID is missing in the request.")
+            logger.warning("Region ID is missing in the request.")
             return jsonify({"message": "Region ID is required."}), 400
 
         # Map region ID to region name
         region_name = REGION_MAPPING.get(int(region_id))
         if not region_name:
-            print(f"[ERROR] Invalid region ID: {region_id}")
+            logger.warning(f"Invalid region ID: {region_id}")
             return jsonify({"message": f"Invalid region ID: {region_id}."}), 400
 
         # Log the region name and family status for context
-        print(f"[INFO] Processing for region: {region_name}, family status: {family_status}")
+        logger.debug(f"Processing for region: {region_name}, family status: {family_status}")
 
-        import os
+        # Response body, cached per dataset version. Misses may rebuild the averages after a
+        # dataset change: they run on the data pool, away from the predictions
+        response_data, status = AVERAGES_CACHE.get_or_compute(
+            (region_name, family_status), lambda: DATA_EXECUTOR.run(build_results_response, region_name, family_status),
+            version=DATASET.version
+        )
+        logger.debug(f"Response data: {response_data}")  # Log the response
+        with phase('serialize'):
+            return jsonify(response_data), status
 
-        # Resolve the path relative to the backend directory
-        base_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))  # Go up one level from app
-        file_path = os.path.join(base_dir, 'data', 'updated_responses.xlsx')
+    except Rejected:
+        raise
+    except Exception as e:
+        # Log the exception for debugging
+        logger.exception(f"Exception in /display_results: {e}")
+        return jsonify({"message": "An internal server error occurred."}), 500
+
+@routes.route('/display_results_all', methods=['GET'])
+def display_results_all():
+    """
+    Route to return the averages of every region and family status in one response,
+    so the map page can preload all regions.
+    """
+    table = DATA_EXECUTOR.run(get_averages_table)
+    regions = {
+        region_id: {
+            "name": region_name,
+            "averages": {status: table[(region_name, status)] for status in FAMILY_STATUSES}
+        }
+        for region_id, region_name in REGION_MAPPING.items()
+    }
+    return jsonify({"version": DATASET.version, "regions": regions})
+
+def build_distribution_response(region_name, family_status, quantiles, bins):
+    """
+    Builds the /distribution body and status code for a region and family status.
+    """
+    distributions = lookup_distributions(region_name, family_status, quantiles, bins)
+    if distributions is None:
+        return {
+            "message": f"No data available for region '{region_name}' and family status '{family_status}'."
+        }, 404
+    return {
+        "region": region_name,
+        "family_status": family_status,
+        "relative_accuracy": SKETCH_ACCURACY,
+        "distributions": distributions,
+    }, 200
+
+@routes.route('/distribution', methods=['GET'])
+def distribution():
+    """
+    Route to return the distribution of each expense category for a region and family status:
+    count, range, quantiles and histogram, from the sketches precomputed at ingestion.
 
-        # Check if the file exists
-        print("Resolved file path:", file_path)
-        print("File exists:", os.path.exists(file_path))
+    Query parameters: region (ID), family_status (default Married), q (quantile between 0
+    and 1, repeatable, default P10/P25/P50/P75/P90) and bins (histogram bins, default 20).
+    Quantiles are within `relative_accuracy` of the exact values.
+    """
+    try:
+        region_name = REGION_MAPPING.get(int(request.args.get('region', '')))
+        family_status = request.args.get('family_status', 'Married')
+        quantiles = tuple(float(q) for q in request.args.getlist('q')) or DISTRIBUTION_QUANTILES
+        bins = int(request.args.get('bins', HISTOGRAM_BINS))
+    except ValueError:
+        logger.warning(f"Invalid /distribution parameters: {request.args.to_dict(flat=False)}")
+        return jsonify({"message": "Invalid input: region, q and bins must be numbers."}), 400
+    if not region_name:
+        return jsonify({"message": f"Invalid region ID: {request.args.get('region')}."}), 400
+    if not all(0 <= q <= 1 for q in quantiles) or len(quantiles) > 20 or not 1 <= bins <= 200:
+        return jsonify({"message": "Invalid input: q must be between 0 and 1 (at most 20), bins between 1 and 200."}), 400
+
+    # Cached per dataset version, misses run on the data pool like /display_results
+    response_data, status = DISTRIBUTION_CACHE.get_or_compute(
+        (region_name, family_status, quantiles, bins),
+        lambda: DATA_EXECUTOR.run(build_distribution_response, region_name, family_status, quantiles, bins),
+        version=DATASET.version
+    )
+    with phase('serialize'):
+        return jsonify(response_data), status
+
+@routes.route('/dataset_stats', methods=['GET'])
+def dataset_stats():
+    """
+    Route to report the dataset cache counters (hits, misses, reloads) and loaded version.
+    """
+    return jsonify(DATASET.stats())
 
+@routes.route('/cache_stats', methods=['GET'])
+def cache_stats_route():
+    """
+    Route to report the size, hit ratio and eviction counters of the response caches.
+    """
+    return jsonify(cache_stats())
 
-        data = pd.read_excel(file_path)
+@routes.route('/metrics', methods=['GET'])
+def metrics():
+    """
+    Route to export the request counters, latency histograms and cache/dataset/model stats
+    in the Prometheus text format.
+    """
+    return Response(render_metrics(), mimetype='text/plain; version=0.0.4')
 
+@register_collector
+def collect_stats():
+    """
+    Exposes the dataset, response cache and trainer counters on /metrics.
+    """
+    dataset = DATASET.stats()
+    caches = cache_stats()
+    model = TRAINER.status()
+    samples = {
+        "piweb_dataset_lookups_total": ("counter", "Dataset cache lookups by outcome.", [
+            ({"outcome": outcome}, dataset[outcome]) for outcome in ('hits', 'misses', 'reloads')
+        ]),
+        "piweb_model_trainings_total": ("counter", "Model trainings by outcome.", [
+            ({"outcome": "success"}, model["trainings"]), ({"outcome": "failure"}, model["failures"])
+        ]),
+        "piweb_model_training_duration_seconds": ("gauge", "Duration of the training of the served models.", [
+            ({}, model["training_duration"] or 0.0)
+        ]),
+    }
+    for stat, kind, documentation in (
+        ('hits', 'counter', 'Response cache hits.'), ('misses', 'counter', 'Response cache misses.'),
+        ('evictions', 'counter', 'Response cache LRU evictions.'), ('size', 'gauge', 'Response cache entries.'),
+        ('hit_ratio', 'gauge', 'Response cache hit ratio.'),
+    ):
+        samples[f"piweb_cache_{stat}" + ("_total" if kind == 'counter' else '')] = (
+            kind, documentation, [({"cache": name}, stats[stat]) for name, stats in caches.items()]
+        )
+    executors = executor_stats()
+    for stat, kind, documentation in (
+        ('pending', 'gauge', 'Tasks running or queued on the executor.'),
+        ('rejected', 'counter', 'Tasks rejected with a 429 because the executor was full.'),
+        ('timeouts', 'counter', 'Tasks answered with a 504 because they timed out.'),
+    ):
+        samples[f"piweb_executor_{stat}" + ("_total" if kind == 'counter' else '')] = (
+            kind, documentation, [({"executor": name}, stats[stat]) for name, stats in executors.items()]
+        )
+    batcher = SUBMIT_BATCHER.stats()
+    for stat, documentation in (
+        ('batches', 'Coalesced prediction batches run.'), ('rows', 'Rows predicted in coalesced batches.'),
+        ('fallbacks', 'Failed batches retried row by row.'),
+        ('rejected', 'Rows rejected with a 429 because too many were waiting.'),
+        ('timeouts', 'Rows answered with a 504 because their batch took too long.'),
+    ):
+        samples[f"piweb_batcher_{stat}_total"] = ("counter", documentation, [({"batcher": SUBMIT_BATCHER.name}, batcher[stat])])
+    return samples
+
+@routes.route('/responses', methods=['POST'])
+def append_responses_route():
+    """
+    Route to append new survey responses to the dataset, as {"responses": [{column: answer}]}.
 
-        # Nettoyage et standardisation des colonnes
-        data.columns = data.columns.str.strip()  # Supprime les espaces inutiles dans les noms de colonnes
-        data['Family status'] = data['Situation Familiale'].replace({'Divorcé': 'Single','Célibataire': 'Single','Marié': 'Married','Celibataire': 'Single'})
+    The averages reflect them on the next request, and the models are refit in the background.
+    Requires the PIWEB_APPEND_TOKEN bearer token; the route is disabled when it is not set.
+    """
+    if not check_append_token(request.headers.get('Authorization')):
+        return jsonify({"error": "Forbidden"}), 403
 
-        # Application de la fonction de conversion sur les colonnes numériques
-        numeric_columns = ['Salaire (DH)', 'Perte Mensuelle Transport (DH)', 'Dépenses Alimentaires (DH)', 'Dépenses Par Repas (DH)']
-        for col in numeric_columns:
-            data[col] = data[col].apply(convert_currency_to_avg)
+    responses = (request.get_json(silent=True) or {}).get('responses')
+    if not isinstance(responses, list) or not responses or not all(isinstance(row, dict) for row in responses):
+        return jsonify({"error": "Invalid input: 'responses' must be a non-empty list of objects."}), 400
 
-        # Gestion des valeurs manquantes dans les colonnes nécessaires pour le calcul
-        required_columns = ['Factures Mensuelles (DH)', 'Perte Mensuelle Transport (DH)', 'Dépenses Alimentaires (DH)', 'Dépenses Par Repas (DH)']
-        data[required_columns] = data[required_columns].fillna(0)  # Remplace les valeurs manquantes par 0
+    try:
+        rows = append_responses(responses, DATASET.path)
+    except InvalidResponses as e:
+        return jsonify({"error": f"Invalid input: {e}"}), 400
+    except Exception as e:
+        logger.exception(f"Exception in /responses: {e}")
+        return jsonify({"error": f"An error occurred: {str(e)}"}), 500
 
-        # Création de la colonne "Dépense Mensuelle Totale"
-        data['Dépense Mensuelle Totale'] = data[required_columns].sum(axis=1)  # Somme des dépenses mensuelles
+    DATASET.recheck()
+    logger.info(f"Appended {rows} survey responses")
+    return jsonify({"appended": rows, "version": DATASET.version}), 201
 
-        # Filter data using utility function
-        filtered_data = filter_data(data,region_name, family_status)
-        print(f"[INFO] Filtered data count: {len(filtered_data)}")  # Log the number of records found
+@routes.route('/healthz', methods=['GET'])
+def healthz():
+    """
+    Liveness probe: the process is up and answering requests.
+    """
+    return jsonify({"status": "ok", "pid": os.getpid()}), 200
 
-        # Calculate averages using utility function
-        averages = calculate_averages(filtered_data)
+@routes.route('/readyz', methods=['GET'])
+def readyz():
+    """
+    Readiness probe: models are loaded and requests can be served.
+    """
+    models = TRAINER.current
+    if not models:
+        return jsonify({"status": "not ready", "error": TRAINER.last_error}), 503
+    return jsonify({"status": "ready", "version": models.version, "pid": os.getpid()}), 200
 
-        # Handle case where no data is found
-        if averages is None:
-            print(f"[INFO] No data found for region: {region_name}, family status: {family_status}")
-            return jsonify({
-                "message": f"No data available for region '{region_name}' and family status '{family_status}'."
-            }), 404
+@routes.route('/model_status', methods=['GET'])
+def model_status():
+    """
+    Route to report the served model version, the last training duration and the last error.
+    """
+    return jsonify(TRAINER.status())
 
-        # Successful response
-        response_data = {
-            "message": f"Results for region '{region_name}' and family status '{family_status}':",
-            "averages": averages
-        }
-        print(f"[INFO] Response data: {response_data}")  # Log the response
-        return jsonify(response_data)
+@routes.route('/region_surface', methods=['GET'])
+def region_surface():
+    """
+    Route to download the region probability surface of the served model, so that the mini form
+    can sample the predicted region client-side. Conditional requests are answered with a 304
+    until the model version, the salary grid or the training settings change.
+    """
+    models = TRAINER.current
+    if not models:
+        return jsonify({"error": "Model not loaded"}), 503
+    if models.region_surface is None:
+        return jsonify({"error": "Region surface disabled"}), 404
 
-    except Exception as e:
-        # Log the exception for debugging
-        print(f"[ERROR] Exception in /display_results: {e}")
-        return jsonify({"message": "An internal server error occurred."}), 500
+    with phase('serialize'):
+        response = jsonify({"version": models.version, **models.region_surface.to_dict()})
+    response.set_etag(models.region_surface.etag(models.version))
+    return response.make_conditional(request)
 
 @routes.route('/display_results_byMiniForm', methods=['GET'])
 def display_results_byMiniForm():
@@ -160,8 +542,14 @@ def display_results_byMiniForm():
         if family_status not in ['Single', 'Married']:
             return jsonify({"error": "Invalid input: Family status must be 'Single' or 'Married'."}), 400
 
+        models = TRAINER.current
+        if not models:
+            return jsonify({"error": "Model not loaded"}), 503
+
         # Call the prediction function
-        region = predict_region(salary, family_status)
+        region = PREDICT_EXECUTOR.run(lambda: predict_region(
+            salary, family_status, model=models.region_model, version=models.version, surface=models.region_surface
+        ))
 
         # Return the predicted region
         return jsonify({
@@ -170,6 +558,8 @@ def display_results_byMiniForm():
             "predicted_region": region
         }), 200
 
+    except Rejected:
+        raise
     except Exception as e:
-        print(f"[ERROR] {str(e)}")
+        logger.exception(str(e))
         return jsonify({"error": f"An error occurred: {str(e)}"}), 500
\ No newline at end of file
@@ -0,0 +1,197 @@
+import math
+import os
+
+import numpy as np
+
+# Relative accuracy of the quantile sketches: an estimated quantile is within this fraction
+# of the exact value
+SKETCH_ACCURACY = float(os.environ.get('PIWEB_SKETCH_ACCURACY', '0.01'))
+
+
+class QuantileSketch:
+    """
+    Mergeable quantile sketch with a bounded relative error, after DDSketch.
+
+    Positive values are counted in logarithmic buckets: bucket i holds the values in
+    (gamma^(i-1), gamma^i], with gamma = (1 + a) / (1 - a) for a relative accuracy a, and
+    values <= 0 (answers of 0 DH) in a separate zero bucket. A quantile is answered with the
+    middle 2 gamma^i / (gamma + 1) of the bucket holding the value of that rank, which is
+    within a relative error a of it (the value of rank floor(q (n - 1)), as
+    np.quantile(method='lower')).
+
+    The buckets are plain counts, so two sketches merge exactly by adding them: the sketches
+    of new responses are merged into the stored ones without re-reading the history. The
+    size is bounded by the range of the values, not their number: a 1% accuracy needs about
+    115 buckets per decade, far fewer on survey answers, which repeat a few amounts.
+    """
+
+    def __init__(self, relative_accuracy=SKETCH_ACCURACY, zeros=0, bins=None, minimum=None, maximum=None):
+        if not 0 < relative_accuracy < 1:
+            raise ValueError(f"Invalid relative accuracy: {relative_accuracy}")
+        self.relative_accuracy = relative_accuracy
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._log_gamma = math.log(self.gamma)
+        self.zeros = zeros
+        self.bins = dict(bins or {})  # bucket index -> count
+        self.min = minimum
+        self.max = maximum
+
+    @property
+    def count(self):
+        return self.zeros + sum(self.bins.values())
+
+    def add(self, values):
+        """
+        Counts an array of values; missing values (NaN) are skipped. Returns the sketch.
+        """
+        values = np.asarray(values, dtype=float)
+        values = values[~np.isnan(values)]
+        if not len(values):
+            return self
+
+        low, high = float(values.min()), float(values.max())
+        self.min = low if self.min is None else min(self.min, low)
+        self.max = high if self.max is None else max(self.max, high)
+
+        positive = values[values > 0]
+        self.zeros += len(values) - len(positive)
+        indexes, counts = np.unique(np.ceil(np.log(positive) / self._log_gamma).astype(np.int64), return_counts=True)
+        for index, count in zip(indexes.tolist(), counts.tolist()):
+            self.bins[index] = self.bins.get(index, 0) + count
+        return self
+
+    def merge(self, other):
+        """
+        Adds the counts of another sketch of the same accuracy. Returns the sketch.
+        """
+        if other.relative_accuracy != self.relative_accuracy:
+            raise ValueError("Cannot merge sketches of different accuracies.")
+        self.zeros += other.zeros
+        for index, count in other.bins.items():
+            self.bins[index] = self.bins.get(index, 0) + count
+        for bound, pick in (('min', min), ('max', max)):
+            values = [value for value in (getattr(self, bound), getattr(other, bound)) if value is not None]
+            setattr(self, bound, pick(values) if values else None)
+        return self
+
+    def _estimate(self, index):
+        # Middle of the bucket in relative terms, within the observed range
+        return min(max(2 * self.gamma ** index / (self.gamma + 1), self.min), self.max)
+
+    def quantile(self, q):
+        """
+        Returns the estimated q-quantile (0 <= q <= 1), or None if the sketch is empty.
+        """
+        total = self.count
+        if total == 0:
+            return None
+        if q <= 0:
+            return self.min
+        if q >= 1:
+            return self.max
+
+        rank = q * (total - 1)
+        seen = self.zeros
+        if rank < seen:
+            return min(max(0.0, self.min), self.max)
+        for index in sorted(self.bins):
+            seen += self.bins[index]
+            if rank < seen:
+                return self._estimate(index)
+        return self.max
+
+    def histogram(self, bins):
+        """
+        Returns the counts over `bins` equal-width bins between the minimum and the maximum,
+        as [{"low", "high", "count"}]. Each bucket is counted at its estimate, so bin edges
+        are exact within the relative accuracy.
+        """
+        if self.count == 0:
+            return []
+        values = [min(max(0.0, self.min), self.max)] + [self._estimate(index) for index in self.bins]
+        weights = [self.zeros] + list(self.bins.values())
+        high = self.max if self.max > self.min else self.min + 1
+        counts, edges = np.histogram(values, bins=max(bins, 1), range=(self.min, high), weights=weights)
+        return [
+            {"low": float(edges[i]), "high": float(edges[i + 1]), "count": int(count)}
+            for i, count in enumerate(counts)
+        ]
+
+    def to_dict(self):
+        return {"zeros": self.zeros, "bins": {str(index): count for index, count in sorted(self.bins.items())},
+                "min": self.min, "max": self.max}
+
+    @classmethod
+    def from_dict(cls, value, relative_accuracy):
+        return cls(relative_accuracy, value["zeros"], {int(index): count for index, count in value["bins"].items()},
+                   value["min"], value["max"])
+
+
+def sketch_groups(groups, columns, relative_accuracy=SKETCH_ACCURACY):
+    """
+    Sketches `columns` for every (region, family status, {column: values}) of `groups`
+    (see survey.CompactSurvey.groups).
+
+    Returns:
+        A dict mapping (region name, family status) to one QuantileSketch per column.
+    """
+    return {
+        (region, status): [QuantileSketch(relative_accuracy).add(values[column]) for column in columns]
+        for region, status, values in groups
+    }
+
+
+def sketch_survey(data, columns, relative_accuracy=SKETCH_ACCURACY):
+    """
+    Sketches `columns` of a cleaned survey (or a chunk of new responses) for every
+    (region, family status) pair, in a single grouping pass. See sketch_groups.
+    """
+    groups = (
+        (region, status, {column: group[column].to_numpy(dtype=float) for column in columns})
+        for (region, status), group in data.groupby(['Région', 'Family status'], sort=False)
+    )
+    return sketch_groups(groups, columns, relative_accuracy)
+
+
+def merge_sketches(total, delta):
+    """
+    Returns the sketches of `total` updated with those of `delta`, in O(pairs x buckets).
+    The sketches of `total` are updated in place.
+    """
+    merged = dict(total)
+    for key, sketches in delta.items():
+        if key in merged:
+            merged[key] = [current.merge(sketch) for current, sketch in zip(merged[key], sketches)]
+        else:
+            merged[key] = sketches
+    return merged
+
+
+def encode_sketches(sketches, columns, relative_accuracy=SKETCH_ACCURACY):
+    """
+    Converts sketches into their JSON manifest form.
+    """
+    return {
+        "columns": columns,
+        "relative_accuracy": relative_accuracy,
+        "groups": [
+            {"region": region, "family_status": status, "sketches": [sketch.to_dict() for sketch in value]}
+            for (region, status), value in sketches.items()
+        ],
+    }
+
+
+def decode_sketches(encoded, columns):
+    """
+    Converts sketches back from their manifest form. Returns None if they are missing or were
+    computed over other columns.
+    """
+    if not encoded or encoded.get("columns") != columns:
+        return None
+    relative_accuracy = encoded["relative_accuracy"]
+    return {
+        (group["region"], group["family_status"]): [
+            QuantileSketch.from_dict(value, relative_accuracy) for value in group["sketches"]
+        ]
+        for group in encoded["groups"]
+    }
@@ -1,5 +1,11 @@
 let currentStatus = 'Married'; // Default status
 let currentRegionId = null; // Store the currently selected region
+let preloadedResults = null; // Averages of every region, preloaded from /display_results_all
+let preloadedAt = 0; // When preloadedResults was fetched, in ms since the epoch
+let preloadRequest = null; // Pending /display_results_all request
+const PRELOAD_TTL_MS = 5 * 60 * 1000; // Age after which the preloaded averages are fetched again
+let regionSurface = null; // Region probabilities by salary and status, loaded from /region_surface
+let regionSurfaceRequest = null; // Pending or completed /region_surface download
 
 // Function to handle status toggle
 function setFamilyStatus(status) {
@@ -106,6 +112,23 @@ async function fetchRegionResults(regionId) {
     console.log('[INFO] Fetching results for region ID:', regionId);
 
     const resultContainer = document.getElementById('result-container');
+
+    // Refresh the preloaded matrix once it is older than PRELOAD_TTL_MS, so that the averages
+    // follow the responses appended since the page was loaded
+    if (Date.now() - preloadedAt > PRELOAD_TTL_MS) {
+        await refreshRegionResults();
+    }
+
+    // Serve from the preloaded matrix when available
+    const preloaded = preloadedResults && preloadedResults[regionId];
+    if (preloaded && preloaded.averages[currentStatus]) {
+        resultContainer.innerHTML = renderResults({
+            message: `Results for region '${preloaded.name}' and family status '${currentStatus}':`,
+            averages: preloaded.averages[currentStatus],
+        });
+        return;
+    }
+
     resultContainer.innerHTML = '<p class="text-gray-600">Loading...</p>';
 
     try {
@@ -132,8 +155,95 @@ async function fetchRegionResults(regionId) {
     }
 }
 
+// Function to preload the results of every region in one request
+async function preloadRegionResults() {
+    try {
+        const response = await fetch('/display_results_all');
+        if (response.ok) {
+            const data = await response.json();
+            preloadedResults = data.regions;
+            preloadedAt = Date.now();
+            console.log('[INFO] Preloaded results for dataset version:', data.version);
+        }
+    } catch (error) {
+        console.error('[ERROR] Preload failed:', error);
+    }
+}
+
+// Function to preload the results again, sharing the request already in flight if any
+function refreshRegionResults() {
+    if (!preloadRequest) {
+        preloadRequest = preloadRegionResults().finally(() => {
+            preloadRequest = null;
+        });
+    }
+    return preloadRequest;
+}
+
+// Function to download the region probability surface used by the mini form
+async function fetchRegionSurface() {
+    try {
+        const response = await fetch('/region_surface');
+        if (response.ok) {
+            regionSurface = await response.json();
+            console.log('[INFO] Loaded region surface for model version:', regionSurface.version);
+            return;
+        }
+    } catch (error) {
+        console.error('[ERROR] Region surface download failed:', error);
+    }
+    regionSurfaceRequest = null; // Retried on the next use of the mini form
+}
+
+// Function to load the region surface once, when the mini form is first used rather than on
+// every page load (the surface weighs ~130 KB)
+function loadRegionSurface() {
+    if (!regionSurfaceRequest) {
+        regionSurfaceRequest = fetchRegionSurface();
+    }
+    return regionSurfaceRequest;
+}
+
+// Function to sample a region from the preloaded surface, or null when it does not cover the inputs
+function sampleRegionLocally(salary, familyStatus) {
+    if (!regionSurface) {
+        return null;
+    }
+    const status = regionSurface.family_statuses.indexOf(familyStatus);
+    const rows = regionSurface.probabilities[status];
+    const position = (salary - regionSurface.salary_start) / regionSurface.salary_step;
+    if (status < 0 || !(position >= 0 && position <= rows.length - 1)) {
+        return null;
+    }
+
+    // Linear interpolation between the two neighbouring grid points, as on the server
+    const index = Math.floor(position);
+    const fraction = position - index;
+    const low = rows[index];
+    const high = rows[Math.min(index + 1, rows.length - 1)];
+    const weights = low.map((probability, i) => probability + (high[i] - probability) * fraction);
+
+    // Weighted random choice
+    let threshold = Math.random() * weights.reduce((sum, weight) => sum + weight, 0);
+    for (let i = 0; i < weights.length; i++) {
+        threshold -= weights[i];
+        if (threshold < 0) {
+            return regionSurface.regions[i];
+        }
+    }
+    return regionSurface.regions[weights.length - 1];
+}
+
 // Attach event listeners to SVG paths
 document.addEventListener('DOMContentLoaded', () => {
+    refreshRegionResults();
+
+    // Start downloading the region surface as soon as the mini form gets the focus
+    const salaryInput = document.getElementById('salaryInput');
+    if (salaryInput) {
+        salaryInput.addEventListener('focus', loadRegionSurface, { once: true });
+    }
+
     console.log('[INFO] DOM fully loaded. Attaching event listeners.');
     document.querySelectorAll('svg path').forEach((path) => {
         path.addEventListener('click', handleRegionClick);
@@ -169,16 +279,23 @@ async function handlePredictButtonClick() {
     }
 
     try {
-        // Call the backend API
-        const response = await fetch(`/display_results_byMiniForm?salary=${salary}&family_status=${familyStatus}`);
-        if (!response.ok) {
-            const errorData = await response.json();
-            throw new Error(errorData.error);
+        // Sample from the preloaded surface when it covers the salary, otherwise call the backend API
+        let prediction;
+        await loadRegionSurface();
+        const localRegion = sampleRegionLocally(salary, familyStatus);
+        if (localRegion) {
+            prediction = { salary, family_status: familyStatus, predicted_region: localRegion };
+        } else {
+            const response = await fetch(`/display_results_byMiniForm?salary=${salary}&family_status=${familyStatus}`);
+            if (!response.ok) {
+                const errorData = await response.json();
+                throw new Error(errorData.error);
+            }
+
+            // Parse the response JSON
+            prediction = await response.json();
         }
 
-        // Parse the response JSON
-        const prediction = await response.json();
-
         // Define region images
         const REGION_IMAGES = {
             "Tanger-Tétouan-Al Hoceima": "static/images/tanger.jpg",
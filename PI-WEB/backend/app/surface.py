@@ -0,0 +1,136 @@
+import hashlib
+import json
+import os
+
+import numpy as np
+
+from .metrics import phase
+from .training import training_settings
+
+# Salary grid of the region probability surface, in DH (a step of 0 disables the surface)
+SURFACE_STEP = float(os.environ.get('PIWEB_SURFACE_STEP', '50'))
+SURFACE_MAX_SALARY = float(os.environ.get('PIWEB_SURFACE_MAX_SALARY', '50000'))
+
+# Decimals kept in the downloadable surface
+SURFACE_DECIMALS = 6
+
+
+class RegionSurface:
+    """
+    Region probabilities of a RegionModel precomputed on a salary grid, for each family status.
+
+    The region model only depends on the salary and a binary family status, so its posterior
+    is a smooth curve per status. It is evaluated once on the grid start, start + step, ...,
+    and read back by linear interpolation between the two neighbouring grid points: an array
+    index and a weighted sum, without any scikit-learn call.
+
+    Linear interpolation deviates from the exact predict_proba by at most step² / 8 times the
+    largest second derivative of the posterior, so halving the step divides the error by ~4.
+    The deviation is measured at the midpoints of the grid, where it peaks, when the surface is
+    built and reported as `max_error` (about 2e-5 with the default 50 DH step).
+    Salaries outside the grid are not covered: lookup() returns None for them.
+
+    `settings` are the training settings of the region model (see training.training_settings),
+    recorded when the surface is built.
+    """
+
+    def __init__(self, classes, statuses, start, step, probabilities, max_error, settings=None):
+        self.classes_ = classes
+        self.statuses = statuses
+        self.start = start
+        self.step = step
+        self.probabilities = probabilities
+        self.max_error = max_error
+        self.settings = settings
+        self._status_index = {status: i for i, status in enumerate(statuses)}
+        self._payload = None
+
+    @property
+    def stop(self):
+        return self.start + self.step * (self.probabilities.shape[1] - 1)
+
+    def lookup(self, salary, family_status):
+        """
+        Returns the interpolated probability of each region in `classes_`, or None if the
+        salary is outside the grid or the family status is unknown.
+        """
+        status = self._status_index.get(family_status)
+        position = (salary - self.start) / self.step
+        if status is None or not 0 <= position <= self.probabilities.shape[1] - 1:
+            return None
+
+        index = int(position)
+        fraction = position - index
+        row = self.probabilities[status, index]
+        if fraction == 0:
+            return row
+        return row + (self.probabilities[status, index + 1] - row) * fraction
+
+    def etag(self, version):
+        """
+        Returns the HTTP entity tag of the surface of the model trained on dataset `version`: it
+        also changes with the salary grid, the decimals and the training settings the surface
+        was built with, which change the surface without changing the dataset.
+        """
+        key = [version, self.start, self.step, self.stop, SURFACE_DECIMALS, self.settings]
+        return hashlib.sha256(json.dumps(key, sort_keys=True).encode()).hexdigest()[:32]
+
+    def to_dict(self):
+        """
+        Returns the surface as a JSON-serializable dict, for clients that sample locally.
+        Built once per surface.
+        """
+        if self._payload is None:
+            self._payload = {
+                "regions": [str(region) for region in self.classes_],
+                "family_statuses": list(self.statuses),
+                "salary_start": self.start,
+                "salary_step": self.step,
+                "salary_stop": self.stop,
+                "max_error": self.max_error,
+                # probabilities[status][salary index][region]
+                "probabilities": np.round(self.probabilities.astype(float), SURFACE_DECIMALS).tolist(),
+            }
+        return self._payload
+
+
+def build_region_surface(region_model, step=None, max_salary=None, start=0.0):
+    """
+    Evaluates a RegionModel on the salary grid for every family status it was trained on.
+    The model is expected to be trained with the current training settings, as the trainer's
+    models are (stale artifacts are retrained, see artifacts.load_or_train).
+
+    Args:
+        region_model: Trained RegionModel (see utils.train_region_model).
+        step: Grid resolution in DH. Defaults to SURFACE_STEP.
+        max_salary: Last salary of the grid. Defaults to SURFACE_MAX_SALARY.
+        start: First salary of the grid.
+
+    Returns:
+        A RegionSurface, or None if the surface is disabled (step <= 0).
+    """
+    step = SURFACE_STEP if step is None else step
+    max_salary = SURFACE_MAX_SALARY if max_salary is None else max_salary
+    if step <= 0:
+        return None
+
+    with phase('surface'):
+        salaries = start + step * np.arange(int((max_salary - start) // step) + 1)
+        midpoints = salaries[:-1] + step / 2
+        statuses = list(region_model.family_statuses)
+
+        def exact(points, code):
+            return region_model.predict_proba_batch(points, code)
+
+        # One batch per status over the whole grid, stored as float32
+        probabilities = np.stack([exact(salaries, code) for code in range(len(statuses))]).astype(np.float32)
+
+        # Interpolation error at the midpoints, against the exact posterior
+        max_error = 0.0
+        for code in range(len(statuses)):
+            interpolated = (probabilities[code, :-1].astype(float) + probabilities[code, 1:]) / 2
+            if len(midpoints):
+                max_error = max(max_error, float(np.abs(interpolated - exact(midpoints, code)).max()))
+
+    return RegionSurface(region_model.classes_, statuses, float(start), float(step), probabilities, max_error,
+                         settings=training_settings())
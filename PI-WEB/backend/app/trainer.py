@@ -0,0 +1,197 @@
+import logging
+import os
+import threading
+import time
+
+import numpy as np
+
+from .artifacts import load_or_train
+from .dataset import DATASET
+from .metrics import phase
+from .surface import build_region_surface
+from .utils import FAMILY_STATUSES, predict_expenses_batch, train_expense_model, train_region_model
+
+logger = logging.getLogger(__name__)
+
+# Seconds between two checks of the dataset version by the background trainer
+TRAINER_INTERVAL = float(os.environ.get('PIWEB_TRAINER_INTERVAL', '5.0'))
+
+
+class DatasetChanged(Exception):
+    """
+    The dataset changed while its models were being refreshed: they are refreshed again on the
+    next check rather than saved or published under the previous version.
+    """
+
+
+class ModelSet:
+    """
+    Immutable snapshot of the served models and the dataset version they were trained on.
+    """
+
+    def __init__(self, version, expense_model, region_model, trained_at, duration, region_surface=None):
+        self.version = version
+        self.expense_model = expense_model
+        self.region_model = region_model
+        self.region_surface = region_surface
+        self.trained_at = trained_at
+        self.duration = duration
+
+
+def validate_models(expense_model, region_model):
+    """
+    Checks that freshly trained models give usable predictions before they are served.
+    Raises a ValueError otherwise.
+    """
+    # One probe per region and family status seen by the expense model
+    probes = [(region, status) for region in expense_model.regions for status in expense_model.family_statuses]
+    expenses, remaining_balances = predict_expenses_batch(
+        expense_model, [5000.0] * len(probes), [region for region, _ in probes],
+        [status for _, status in probes], [0.0] * len(probes), np.ones(4)
+    )
+    if expenses.shape != (len(probes), 4) or not np.isfinite(expenses).all() or not np.isfinite(remaining_balances).all():
+        raise ValueError("Validation failed: the expense model returned invalid predictions.")
+
+    for status in FAMILY_STATUSES:
+        probabilities = region_model.predict_proba(5000.0, status)
+        if not np.isfinite(probabilities).all() or not np.isclose(probabilities.sum(), 1.0):
+            raise ValueError("Validation failed: the region model returned invalid probabilities.")
+
+
+class ModelTrainer:
+    """
+    Trains the expense and region models off the request path and swaps them in atomically.
+
+    A background thread watches the dataset version. When it changes, both models are loaded
+    from their artifacts or retrained, validated, and published as a new ModelSet with a single
+    reference assignment. Requests keep using the previous ModelSet until then, and a failed
+    training leaves it in place and is reported by status().
+    """
+
+    def __init__(self, interval=TRAINER_INTERVAL):
+        self.interval = interval
+        self.current = None
+        self.training = False
+        self.trainings = 0
+        self.failures = 0
+        self.last_error = None
+        self.last_error_at = None
+        self._failed_version = None
+        self._lock = threading.Lock()
+        self._start_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def refresh(self, force=False):
+        """
+        Trains and swaps in new models if the dataset version changed. Returns True on a swap.
+        Errors are recorded and re-raised; the previous models stay in place and the failing
+        version is not retried until the dataset changes again or `force` is set.
+
+        The models are loaded from their artifacts when they exist: the survey frame is only
+        read (and pandas imported) to train on a miss.
+        """
+        with self._lock:
+            version = DATASET.version
+            if not force and version in (self.current and self.current.version, self._failed_version):
+                return False
+
+            snapshot = {}
+
+            def training_data():
+                # Read on the first artifact miss, with the version it belongs to: data appended
+                # since `version` must not be saved or published under it
+                if not snapshot:
+                    snapshot['version'], snapshot['data'] = DATASET.snapshot()
+                if snapshot['version'] != version:
+                    raise DatasetChanged(f"Dataset {version[:16]} changed during the refresh")
+                return snapshot['data']
+
+            self.training = True
+            start = time.perf_counter()
+            try:
+                with phase('train'):
+                    expense_model = load_or_train('expense_model', lambda: train_expense_model(training_data().copy()), fingerprint=version)
+                    region_model = load_or_train('region_model', lambda: train_region_model(training_data()), fingerprint=version)
+                with phase('validate'):
+                    validate_models(expense_model, region_model)
+                region_surface = build_region_surface(region_model)
+            except DatasetChanged as e:
+                logger.info(f"{e}, retrying on the next check")
+                return False
+            except Exception as e:
+                # Do not retrain the same failing dataset on every tick
+                self._failed_version = version
+                self.failures += 1
+                self.last_error = str(e)
+                self.last_error_at = time.time()
+                logger.error(f"Model training failed for dataset {version[:16]}: {e}")
+                raise
+            finally:
+                self.training = False
+                # The models are built: the served routes do not need the raw survey frame,
+                # which is read again on the next change
+                DATASET.release()
+
+            self.current = ModelSet(version, expense_model, region_model, time.time(), time.perf_counter() - start,
+                                    region_surface=region_surface)
+            self.trainings += 1
+            logger.info(f"Models for dataset {version[:16]} swapped in ({self.current.duration:.2f}s)")
+            return True
+
+    def _run(self):
+        # The first models are loaded right away, the later ones on a dataset change
+        while True:
+            try:
+                self.refresh()
+            except Exception:
+                pass  # Already recorded in status()
+            if self._stop.wait(self.interval):
+                return
+
+    def start(self):
+        """
+        Starts the background thread, which loads the models then watches the dataset
+        (idempotent). Returns at once: requests are answered with a 503 until `current` is set.
+        """
+        if self._thread is not None:
+            return
+        with self._start_lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='model-trainer', daemon=True)
+                self._thread.start()
+
+    def stop(self):
+        """
+        Stops the background thread.
+        """
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self._stop.clear()
+
+    def status(self):
+        """
+        Returns the served model version, the last training duration and the last error.
+        """
+        current = self.current
+        dataset_version = DATASET.version
+        return {
+            "version": current.version if current else None,
+            "dataset_version": dataset_version,
+            # The dataset changed and the models are being (or will be) refit in the background
+            "stale": current is None or current.version != dataset_version,
+            "trained_at": current.trained_at if current else None,
+            "training_duration": current.duration if current else None,
+            "surface_max_error": current.region_surface.max_error if current and current.region_surface else None,
+            "training": self.training,
+            "trainings": self.trainings,
+            "failures": self.failures,
+            "last_error": self.last_error,
+            "last_error_at": self.last_error_at,
+        }
+
+
+# Shared trainer, started on the first request of a create_app app
+TRAINER = ModelTrainer()
@@ -0,0 +1,76 @@
+import os
+
+import numpy as np
+
+# Seed of the training randomness (class balancing, train/test splits): the same dataset and
+# settings always give the same models
+TRAINING_SEED = int(os.environ.get('PIWEB_TRAINING_SEED', '42'))
+
+# How the region model makes up for regions with fewer responses:
+#   upsample: rows of the smaller regions are drawn again until every region has as many rows
+#             as the largest one
+#   priors:   the rows are used once, and the model gets uniform region priors instead
+#   none:     no balancing, the priors follow the region frequencies
+REGION_BALANCE = os.environ.get('PIWEB_REGION_BALANCE', 'upsample')
+BALANCE_MODES = ('upsample', 'priors', 'none')
+
+
+def training_settings():
+    """
+    Returns the settings a trained model depends on besides the dataset, stored with the
+    artifacts so that a change of settings retrains the models.
+    """
+    return {"seed": TRAINING_SEED, "region_balance": REGION_BALANCE}
+
+
+def balance_indexes(labels, seed=TRAINING_SEED):
+    """
+    Returns row indexes in which every class of `labels` appears as many times as the largest
+    class: every row once, plus rows of the smaller classes drawn with replacement.
+
+    The draws of all the classes are made in one vectorized call on a generator seeded with
+    `seed`, without copying any row.
+    """
+    classes, inverse, counts = np.unique(np.asarray(labels), return_inverse=True, return_counts=True)
+    missing = counts.max() - counts
+
+    # Rows grouped by class, and where each group starts
+    by_class = np.argsort(inverse, kind='stable')
+    starts = np.cumsum(counts) - counts
+
+    rng = np.random.default_rng(seed)
+    draws = np.repeat(starts, missing) + rng.integers(0, np.repeat(counts, missing))
+    return np.concatenate([np.arange(len(inverse)), by_class[draws]])
+
+
+def uniform_priors(labels):
+    """
+    Returns equal priors for the classes of `labels`, in sorted class order (as scikit-learn
+    orders `classes_`).
+    """
+    classes = np.unique(np.asarray(labels))
+    return np.full(len(classes), 1 / len(classes))
+
+
+def prepare_region_training_data(features, labels, balance=None, seed=None):
+    """
+    Balances the training rows of the region model.
+
+    Args:
+        features: Array of shape (N, F).
+        labels: Array of N region labels (names or codes).
+        balance: One of BALANCE_MODES. Defaults to REGION_BALANCE.
+        seed: Random seed. Defaults to TRAINING_SEED.
+
+    Returns:
+        The features and labels to train on (upsampled rows follow the original ones).
+    """
+    balance = REGION_BALANCE if balance is None else balance
+    seed = TRAINING_SEED if seed is None else seed
+    if balance not in BALANCE_MODES:
+        raise ValueError(f"Invalid region balance: {balance}. Must be one of {', '.join(BALANCE_MODES)}.")
+
+    if balance == 'upsample' and len(labels):
+        indexes = balance_indexes(labels, seed)
+        return features[indexes], labels[indexes]
+    return features, labels
@@ -1,15 +1,19 @@
-import pandas as pd
-from sklearn.discriminant_analysis import QuadraticDiscriminantAnalysis
-from sklearn.model_selection import train_test_split
-from sklearn.preprocessing import LabelEncoder
-from sklearn.model_selection import train_test_split
-from sklearn.linear_model import LinearRegression
-from sklearn.preprocessing import OneHotEncoder, StandardScaler
-from sklearn.compose import ColumnTransformer
-from sklearn.pipeline import Pipeline
-from sklearn.utils import resample
-import random
+# pandas and scikit-learn are imported in the functions that train or read the survey:
+# serving predictions only needs the NumPy models of inference.py
+import logging
+import os
+import re
 import numpy as np
+from .dataset import DATASET, get_raw_data, get_survey_aggregates, get_survey_sketches
+from .artifacts import load_or_train
+from .cache import REGION_PROBA_CACHE, bucket_salary
+from .inference import QDA_FAMILY_STATUS_MAPPING, export_expense_model, export_region_model, sample_region
+from .metrics import phase
+from .sketch import sketch_groups
+from .survey import FAMILY_STATUS_MAPPING, TOTAL_COLUMNS, get_compact_survey
+from .training import REGION_BALANCE, TRAINING_SEED, prepare_region_training_data, uniform_priors
+
+logger = logging.getLogger(__name__)
 
 # Region mapping (ID to Name)
 REGION_MAPPING = {
@@ -27,6 +31,13 @@ REGION_MAPPING = {
     12: "Dakhla-Oued Eddahab",
 }
 
+# Family statuses served by the routes
+FAMILY_STATUSES = ['Married', 'Single']
+
+# Spending preference levels to weights, and the expense categories they apply to
+PREFERENCE_MAPPING = {"high": 1.5, "medium": 1.0, "low": 0.5}
+EXPENSE_CATEGORIES = ['Rent', 'Utilities', 'Transport', 'Food']
+
 def clean_family_status(family_status):
     mapping = {
         'Marié': 'Married',
@@ -38,154 +49,361 @@ def clean_family_status(family_status):
     return mapping.get(family_status.strip().title(), 'Other')  # Default to 'Other'
 
 
-def convert_currency_to_avg_QDA(value):
+def train_region_model(data, balance=None, seed=None):
     """
-    Convert monetary values into floating-point averages.
-    Handles ranges (e.g., "500-1000") and non-numeric characters (e.g., "500dh").
+    Trains the QDA region model on salary and family status.
+
+    Args:
+        data: Raw survey dataset. It is copied, not modified.
+        balance: How regions with fewer responses are balanced (see training.py).
+            Defaults to REGION_BALANCE.
+        seed: Random seed of the balancing. Defaults to TRAINING_SEED.
+
+    Returns:
+        A RegionModel.
     """
-    if isinstance(value, str):
-        value = value.lower().replace('dh', '').strip()
-        if '-' in value:  # Handle ranges like "0-2500"
-            low, high = map(float, value.split('-'))
-            return (low + high) / 2
-        try:
-            return float(value)
-        except ValueError:
-            return 0.0  # Default to 0.0 if conversion fails
-    return value
+    import pandas as pd
+    from sklearn.discriminant_analysis import QuadraticDiscriminantAnalysis
+    from sklearn.preprocessing import LabelEncoder, StandardScaler
+
+    balance = REGION_BALANCE if balance is None else balance
+    seed = TRAINING_SEED if seed is None else seed
+    data = data.copy()
+
+    # Preprocess the dataset. Blank and unknown family statuses become missing, so that one
+    # bad response cannot fail every later training
+    data = data.dropna(subset=['Région', 'Situation Familiale'])
+    data['Situation Familiale'] = data['Situation Familiale'].astype(str).str.strip().map(QDA_FAMILY_STATUS_MAPPING)
+    data['Salaire (DH)'] = parse_currency_series(data['Salaire (DH)'])
+
+    # Drop rows with missing essential values
+    unknown = data['Situation Familiale'].isna().sum()
+    if unknown:
+        logger.warning(f"Ignoring {unknown} responses with an unknown family status")
+    data = data.dropna(subset=['Salaire (DH)', 'Région', 'Situation Familiale'])
+
+    # Encode categorical family status
+    label_encoder = LabelEncoder()
+    data['Family Status Encoded'] = label_encoder.fit_transform(data['Situation Familiale'])
+
+    # Balance the regions (see training.py). The regions are sorted integer codes until the
+    # export, which spares sorting millions of strings, in the same class order
+    region_codes, regions = pd.factorize(data['Région'], sort=True)
+    features, labels = prepare_region_training_data(
+        data[['Salaire (DH)', 'Family Status Encoded']].to_numpy(dtype=float), region_codes, balance, seed
+    )
+
+    # Scale features
+    scaler = StandardScaler()
+    features_scaled = scaler.fit_transform(features)
+
+    # Train the QDA model on every balanced row: a random split would unbalance the priors
+    # again, and no held-out score is used
+    qda = QuadraticDiscriminantAnalysis(reg_param=0.1, priors=uniform_priors(labels) if balance == 'priors' else None)
+    qda.fit(features_scaled, labels)
 
-def clean_family_status_QDA(family_status):
+    return export_region_model(label_encoder, scaler, qda, regions)
+
+def get_region_model():
     """
-    Normalize family status into consistent categories.
+    Returns the region model, loaded from its artifact or trained on first use, and reloaded
+    only when the dataset changes.
     """
-    mapping = {
-        'Marié': 'Married',
-        'Mariée': 'Married',
-        'Célibataire': 'Single',
-        'Divorcé': 'Single',
-        'Divorcée': 'Single',
-        'Single': 'Single',
-        'Married': 'Married'
-    }
-    result = mapping.get(family_status.strip(), None)
-    if result is None:
-        raise ValueError(f"Invalid family status: {family_status}. Must be 'Single' or 'Married'.")
-    return result
+    return DATASET.derived('region_model', lambda: load_or_train('region_model', lambda: train_region_model(DATASET.get())))
 
-def predict_region(salaire, family_status):
+def predict_region(salaire, family_status, model=None, version=None, surface=None, rng=None):
     """
     Predict the most suitable region based on salary and family status.
     Randomly selects a region weighted by probabilities.
+
+    With a precomputed probability surface, salaries inside its grid are answered from the
+    surface without calling the model; the others go through the model.
+
+    Args:
+        salaire: Monthly salary (in DH).
+        family_status: Single or Married.
+        model: RegionModel to use. Defaults to get_region_model().
+        version: Version of `model`, used to invalidate the probability cache.
+            Defaults to the dataset version.
+        surface: RegionSurface of `model` (see surface.py), or None.
+        rng: random.Random to sample with. Defaults to inference.SAMPLING_RNG
+            (seeded with PIWEB_SAMPLING_SEED).
     """
     try:
-        # Load the dataset
-        data = pd.read_excel('./data/updated_responses.xlsx')
+        if surface is not None:
+            probabilities = surface.lookup(salaire, family_status)
+            if probabilities is not None:
+                return sample_region(surface.classes_, probabilities, rng)
+
+        if model is None:
+            model = get_region_model()
+        if version is None:
+            version = DATASET.version
+
+        # Predict probabilities for the input. Only the probabilities are cached: the
+        # sampled region stays random on every call.
+        salaire = bucket_salary(salaire)
+        probabilities = REGION_PROBA_CACHE.get_or_compute(
+            (salaire, family_status), lambda: model.predict_proba(salaire, family_status),
+            version=version
+        )
+
+        # Randomly select a region weighted by probabilities
+        return model.sample(probabilities, rng)
 
-        # Preprocess the dataset
-        data['Situation Familiale'] = data['Situation Familiale'].apply(clean_family_status_QDA)
-        family_status = clean_family_status_QDA(family_status)  # Clean input as well
-        data['Salaire (DH)'] = data['Salaire (DH)'].apply(convert_currency_to_avg_QDA)
+    except ValueError as ve:
+        logger.error(str(ve))
+        raise
+    except Exception as e:
+        logger.error(str(e))
+        raise
 
-        # Drop rows with missing essential values
-        data = data.dropna(subset=['Salaire (DH)', 'Région', 'Situation Familiale'])
+# Monetary survey answers: "500-1000 dh", "Plus de 2500 dh", "Moins de 500", "0 dh", "1200"
+CURRENCY_PATTERN = r'^(?:(?:plus|moins) de)?\s*(?P<low>\d+(?:\.\d+)?)\s*(?:-\s*(?P<high>\d+(?:\.\d+)?))?$'
+CURRENCY_REGEX = re.compile(CURRENCY_PATTERN)
 
-        # Encode categorical family status
-        label_encoder = LabelEncoder()
-        data['Family Status Encoded'] = label_encoder.fit_transform(data['Situation Familiale'])
+def parse_currency_series(values, fallback=0.0):
+    """
+    Converts a column of monetary answers into floats with vectorized string operations.
 
-        # Prepare features and target
-        features = data[['Salaire (DH)', 'Family Status Encoded']]
-        target = data['Région']
+    Ranges ("500-1000 dh") become their midpoint, "Plus de X" and "Moins de X" become X,
+    numbers are kept as they are and missing values stay NaN.
 
-        # Balance the dataset
-        majority_class = data['Région'].value_counts().idxmax()
-        max_count = data['Région'].value_counts().max()
-        data_balanced = data.copy()
+    Args:
+        values: Series (or sequence) of strings and/or numbers.
+        fallback: Value for strings that cannot be parsed (e.g. 0.0 or np.nan),
+            or 'raise' to raise a ValueError listing them.
 
-        for region in data['Région'].unique():
-            region_data = data[data['Région'] == region]
-            if len(region_data) < max_count:
-                region_data_upsampled = resample(region_data, replace=True, n_samples=max_count, random_state=42)
-                data_balanced = pd.concat([data_balanced, region_data_upsampled])
+    Returns:
+        A float Series aligned with the input.
+    """
+    import pandas as pd
+
+    series = values if isinstance(values, pd.Series) else pd.Series(values, dtype=object)
+    if pd.api.types.is_numeric_dtype(series):
+        return series.astype(float)
+
+    # Survey answers repeat a handful of distinct strings: parse each distinct value once
+    codes, uniques = pd.factorize(series)
+    uniques = pd.Series(uniques, dtype=object)
+
+    # Numbers, and strings that are already plain numbers
+    parsed = pd.to_numeric(uniques, errors='coerce').astype(float)
+
+    # Everything else goes through a single regex pass
+    pending = parsed.isna()
+    if pending.any():
+        text = uniques[pending].astype(str).str.lower().str.replace('dh', '', regex=False).str.strip()
+        parts = text.str.extract(CURRENCY_PATTERN)
+        low = parts['low'].astype(float)
+        high = parts['high'].astype(float)
+        parsed[pending] = ((low + high) / 2).fillna(low)
+
+        invalid = pending & parsed.isna()
+        if invalid.any():
+            if fallback == 'raise':
+                raise ValueError(f"Invalid monetary values: {uniques[invalid].tolist()}")
+            parsed[invalid] = fallback
+
+    # Missing values (code -1) stay NaN
+    result = np.append(parsed.to_numpy(), np.nan)[codes]
+    return pd.Series(result, index=series.index, name=series.name)
+
+def convert_currency_to_avg(value, fallback=0.0):
+    """
+    Convertit une valeur monétaire en un nombre flottant (version scalaire de parse_currency_series).
 
-        # Scale features
-        scaler = StandardScaler()
-        features_scaled = scaler.fit_transform(data_balanced[['Salaire (DH)', 'Family Status Encoded']])
+    The regex is applied to the string directly: building a Series per value cost ~1.7 ms.
+    """
+    if not isinstance(value, str):
+        try:
+            return float(value)  # Numbers, NaN stays NaN
+        except TypeError:
+            return float('nan')  # None and other missing values
 
-        # Split data into train and test sets
-        X_train, X_test, y_train, y_test = train_test_split(features_scaled, data_balanced['Région'], test_size=0.3, random_state=42)
+    try:
+        number = float(value)
+    except ValueError:
+        number = float('nan')
+    if not np.isnan(number):
+        return number
+
+    match = CURRENCY_REGEX.match(value.lower().replace('dh', '').strip())
+    if match is None:
+        if fallback == 'raise':
+            raise ValueError(f"Invalid monetary values: {[value]}")
+        return fallback
+    low = float(match['low'])
+    return (low + float(match['high'])) / 2 if match['high'] is not None else low
+
+def clean_survey_data(data):
+    """
+    Cleans the raw survey dataset for the averages: normalizes the family status, converts
+    the monetary columns and builds the "Dépense Mensuelle Totale" column.
+    """
+    data['Family status'] = data['Situation Familiale'].replace(FAMILY_STATUS_MAPPING)
 
-        # Train the QDA model
-        qda = QuadraticDiscriminantAnalysis(reg_param=0.1)
-        qda.fit(X_train, y_train)
+    # Application de la fonction de conversion sur les colonnes numériques
+    numeric_columns = ['Salaire (DH)', 'Perte Mensuelle Transport (DH)', 'Dépenses Alimentaires (DH)', 'Dépenses Par Repas (DH)']
+    for col in numeric_columns:
+        data[col] = parse_currency_series(data[col])
 
-        # Encode the input family status
-        family_status_encoded = label_encoder.transform([family_status])[0]
+    # Gestion des valeurs manquantes dans les colonnes nécessaires pour le calcul
+    required_columns = TOTAL_COLUMNS
+    data[required_columns] = data[required_columns].fillna(0)  # Remplace les valeurs manquantes par 0
 
-        # Predict probabilities for the input
-        input_data = scaler.transform([[salaire, family_status_encoded]])
-        probabilities = qda.predict_proba(input_data)[0]
+    # Création de la colonne "Dépense Mensuelle Totale"
+    data['Dépense Mensuelle Totale'] = data[required_columns].sum(axis=1)  # Somme des dépenses mensuelles
 
-        # Randomly select a region weighted by probabilities
-        regions = qda.classes_
-        predicted_region = random.choices(regions, weights=probabilities, k=1)[0]
+    return data
 
-        return predicted_region
+# Averages served by /display_results, by cleaned survey column
+AVERAGE_COLUMNS = {
+    'Average Rent (DH)': 'Loyer (DH)',
+    'Average Monthly Bills (DH)': 'Factures Mensuelles (DH)',
+    'Average Transport Loss (DH)': 'Perte Mensuelle Transport (DH)',
+    'Average Food Expenses (DH)': 'Dépenses Alimentaires (DH)',
+    'Average Total Monthly Expenses (DH)': 'Dépense Mensuelle Totale',
+}
 
-    except ValueError as ve:
-        print(f"[ERROR] {str(ve)}")
-        raise
-    except Exception as e:
-        print(f"[ERROR] {str(e)}")
-        raise
+def aggregate_survey(data):
+    """
+    Computes the running sums and counts behind the averages of every (region, family status)
+    pair, in a single grouping pass over a cleaned survey (or a chunk of new responses).
 
-# Fonction pour convertir les valeurs monétaires en moyenne (gestion des plages de valeurs et des caractères non numériques)
-def convert_currency_to_avg(value):
-    """
-    Convertit une valeur monétaire en un nombre flottant.
-    Gère les plages de valeurs (ex: "500-1000"), les caractères non numériques (ex: "500dh"), et les valeurs manquantes.
-    """
-    if isinstance(value, str):
-        value = value.lower().replace('dh', '').strip()  # Supprime "dh" et les espaces inutiles
-        if 'plus de' in value:
-            return float(value.replace('plus de', '').strip())
-        elif 'moins de' in value:
-            return float(value.replace('moins de', '').strip())
-        if '-' in value:  # Gère les plages de valeurs comme "500-1000"
-            low, high = map(float, value.split('-'))
-            return (low + high) / 2
-        try:
-            return float(value)  # Convertit en float si possible
-        except ValueError:
-            return 0.0  # Retourne 0.0 si la conversion échoue
-    return value  # Retourne la valeur d'origine si ce n'est pas une chaîne
+    Returns:
+        A dict mapping (region name, family status) to {"rows": n, "sums": [...], "counts": [...]},
+        the sums and non-missing counts following AVERAGE_COLUMNS.
+    """
+    grouped = data.groupby(['Région', 'Family status'], sort=False)[list(AVERAGE_COLUMNS.values())]
+    sums, counts, sizes = grouped.sum(), grouped.count(), grouped.size()
+    return {
+        key: {"rows": int(sizes[key]), "sums": sums.loc[key].tolist(), "counts": [int(count) for count in counts.loc[key]]}
+        for key in sizes.index
+    }
 
-# Function to filter data
-def filter_data(data, region, family_status):
+def merge_aggregates(total, delta):
+    """
+    Returns the aggregates of `total` updated with those of `delta`, in O(pairs).
     """
-    Filters the data based on the region and family status.
+    merged = dict(total)
+    for key, value in delta.items():
+        if key not in merged:
+            merged[key] = value
+            continue
+        current = merged[key]
+        merged[key] = {
+            "rows": current["rows"] + value["rows"],
+            "sums": [a + b for a, b in zip(current["sums"], value["sums"])],
+            "counts": [a + b for a, b in zip(current["counts"], value["counts"])],
+        }
+    return merged
+
+def averages_from_aggregates(aggregates):
     """
-    filtered_data = data[(data['Région'] == region) & (data['Family status'] == family_status)]
-    return filtered_data
+    Builds the averages table from running sums and counts.
 
-# Function to calculate averages
-def calculate_averages(filtered_data):
+    Returns:
+        A dict mapping (region name, family status) to the averages dict, or to None when the
+        pair has no data. Every pair of REGION_MAPPING x FAMILY_STATUSES is present. An average
+        without any answer (zero count, or a missing or non-finite sum) is None rather than
+        NaN, which is not valid JSON; a pair without any average is None.
+    """
+    table = {}
+    for region in REGION_MAPPING.values():
+        for status in FAMILY_STATUSES:
+            value = aggregates.get((region, status)) or {"sums": [], "counts": []}
+            averages = {
+                name: total / count if count and total is not None and np.isfinite(total) else None
+                for name, total, count in zip(AVERAGE_COLUMNS, value["sums"], value["counts"])
+            }
+            table[(region, status)] = averages if any(average is not None for average in averages.values()) else None
+    return table
+
+def get_averages_table():
+    """
+    Returns the averages table, built once per dataset version.
 
+    It is read from the sums and counts stored with the dataset, which ingestion keeps up to
+    date (see dataset.append_responses), so a new version costs O(pairs) instead of a pass
+    over the whole survey. Datasets written without them fall back to a pass over the
+    compact survey (see survey.py).
     """
-    Calculates averages for the relevant columns.
+    def build():
+        aggregates = get_survey_aggregates(list(AVERAGE_COLUMNS.values()))
+        if aggregates is None:
+            aggregates = get_compact_survey().aggregates(list(AVERAGE_COLUMNS.values()))
+        with phase('aggregate'):
+            return averages_from_aggregates(aggregates)
+
+    return DATASET.derived('averages', build)
+
+def lookup_averages(region, family_status):
     """
-    if filtered_data.empty:
-        return None
+    Returns the precomputed averages for a region and family status, or None if there is no data.
+    """
+    table = get_averages_table()
+    with phase('filter'):
+        return table.get((region, family_status))
+
+# Distributions served by /distribution, by cleaned survey column
+DISTRIBUTION_COLUMNS = {
+    'Rent': 'Loyer (DH)',
+    'Utilities': 'Factures Mensuelles (DH)',
+    'Transport': 'Perte Mensuelle Transport (DH)',
+    'Food': 'Dépenses Alimentaires (DH)',
+    'Total': 'Dépense Mensuelle Totale',
+}
+
+# Quantiles and histogram bins of a distribution, unless the request asks for others
+DISTRIBUTION_QUANTILES = (0.1, 0.25, 0.5, 0.75, 0.9)
+HISTOGRAM_BINS = int(os.environ.get('PIWEB_HISTOGRAM_BINS', '20'))
+
+def get_distribution_table():
+    """
+    Returns the quantile sketches of every (region, family status) pair, as
+    {(region, status): {category: QuantileSketch}}, built once per dataset version.
+
+    Like the averages, they are read from the sketches stored with the dataset and merged at
+    ingestion (see dataset.append_responses); datasets written without them are sketched in
+    one pass over the compact survey.
+    """
+    def build():
+        columns = list(DISTRIBUTION_COLUMNS.values())
+        sketches = get_survey_sketches(columns)
+        if sketches is None:
+            with phase('aggregate'):
+                sketches = sketch_groups(get_compact_survey().groups(), columns)
+        return {key: dict(zip(DISTRIBUTION_COLUMNS, value)) for key, value in sketches.items()}
+
+    return DATASET.derived('distributions', build)
 
-    averages = {
-        'Average Rent (DH)': filtered_data['Loyer (DH)'].mean(),
-        'Average Monthly Bills (DH)': filtered_data['Factures Mensuelles (DH)'].mean(),
-        'Average Transport Loss (DH)': filtered_data['Perte Mensuelle Transport (DH)'].mean(),
-        'Average Food Expenses (DH)': filtered_data['Dépenses Alimentaires (DH)'].mean(),
-        'Average Total Monthly Expenses (DH)': filtered_data['Dépense Mensuelle Totale'].mean()
+def describe_distributions(sketches, quantiles=DISTRIBUTION_QUANTILES, bins=HISTOGRAM_BINS):
+    """
+    Summarizes the sketches of a pair: count, range, quantiles and histogram per category.
+    """
+    return {
+        category: {
+            "count": sketch.count,
+            "min": sketch.min,
+            "max": sketch.max,
+            "quantiles": {f"p{100 * q:g}": sketch.quantile(q) for q in quantiles},
+            "histogram": sketch.histogram(bins),
+        }
+        for category, sketch in sketches.items()
     }
 
-    return averages
+def lookup_distributions(region, family_status, quantiles=DISTRIBUTION_QUANTILES, bins=HISTOGRAM_BINS):
+    """
+    Returns the distributions of a region and family status (see describe_distributions),
+    or None if there is no data. Costs O(buckets), independently of the number of responses.
+    """
+    table = get_distribution_table()
+    with phase('filter'):
+        sketches = table.get((region, family_status))
+    if sketches is None or not any(sketch.count for sketch in sketches.values()):
+        return None
+    return describe_distributions(sketches, quantiles, bins)
 
 
 def predict_expenses(model, salary, region, family_status, target_percentage, spending_preferences):
@@ -194,7 +412,7 @@ def predict_expenses(model, salary, region, family_status, target_percentage, sp
     and spending preferences.
 
     Args:
-        model: Trained model pipeline for predicting expenses.
+        model: Trained ExpenseModel for predicting expenses.
         salary: User's monthly salary (in DH).
         region: User's region as a string.
         family_status: User's family status (Single/Married).
@@ -205,67 +423,148 @@ def predict_expenses(model, salary, region, family_status, target_percentage, sp
         adjusted_expenses: Array of adjusted predicted expenses for each category.
         final_remaining_balance: Remaining balance after adjusting expenses.
     """
-    # Encode user inputs as a DataFrame
-    input_data = pd.DataFrame({
-        'Salaire (DH)': [salary],
-        'Région': [region],
-        'Family status': [family_status]
-    })
+    adjusted_expenses, final_remaining_balance = predict_expenses_batch(
+        model, [salary], [region], [family_status], [target_percentage], spending_preferences
+    )
+
+    # Return adjusted expenses and final remaining balance
+    return adjusted_expenses[0], final_remaining_balance[0]
+
+# Largest number of profiles in one /submit_batch request
+BATCH_MAX_PROFILES = int(os.environ.get('PIWEB_BATCH_MAX_PROFILES', '1000'))
+
+def predict_expenses_batch(model, salaries, regions, family_statuses, target_percentages, spending_preferences):
+    """
+    Vectorized version of predict_expenses for N profiles: one model.predict call, then the
+    preferences, the savings target and the remaining balance as array operations.
+
+    Args:
+        model: Trained ExpenseModel for predicting expenses.
+        salaries: Sequence of N monthly salaries (in DH).
+        regions: Sequence of N region names.
+        family_statuses: Sequence of N family statuses (Single/Married).
+        target_percentages: Sequence of N savings percentages.
+        spending_preferences: Array of shape (4,) applied to every row, or (N, 4) per row.
+
+    Returns:
+        adjusted_expenses: Array of shape (N, 4) of adjusted predicted expenses.
+        final_remaining_balance: Array of shape (N,) of remaining balances.
+    """
+    salaries = np.asarray(salaries, dtype=float)
+    target_percentages = np.asarray(target_percentages, dtype=float)
 
-    # Predict expenses using the trained model
-    predicted_expenses = model.predict(input_data)[0]  # Returns a single row of predictions
+    # Predict expenses using the trained model, one row per profile
+    with phase('predict'):
+        predicted_expenses = model.predict(salaries, list(regions), list(family_statuses))
 
     # Apply user-defined spending preferences to the predicted expenses
-    adjusted_expenses = predicted_expenses * spending_preferences
+    adjusted_expenses = predicted_expenses * np.asarray(spending_preferences, dtype=float)
 
-    # Calculate the total predicted expenses and the user's target remaining balance
-    total_expenses = sum(adjusted_expenses)
-    target_remaining_balance = salary * (target_percentage / 100)
-    max_expenses = salary - target_remaining_balance
+    # Calculate the total predicted expenses and the users' target remaining balances
+    total_expenses = adjusted_expenses.sum(axis=1)
+    target_remaining_balance = salaries * (target_percentages / 100)
+    max_expenses = salaries - target_remaining_balance
 
-    # Adjust expenses proportionally if they exceed the allowable budget
-    if total_expenses > max_expenses:
-        adjustment_factor = max_expenses / total_expenses
-        adjusted_expenses = adjusted_expenses * adjustment_factor
+    # Adjust expenses proportionally where they exceed the allowable budget
+    over_budget = total_expenses > max_expenses
+    adjustment_factor = np.ones_like(total_expenses)
+    adjustment_factor[over_budget] = max_expenses[over_budget] / total_expenses[over_budget]
+    adjusted_expenses = adjusted_expenses * adjustment_factor[:, np.newaxis]
 
-    # Calculate the final remaining balance after expenses
-    final_remaining_balance = salary - sum(adjusted_expenses)
+    # Calculate the final remaining balances after expenses
+    final_remaining_balance = salaries - adjusted_expenses.sum(axis=1)
 
-    # Return adjusted expenses and final remaining balance
     return adjusted_expenses, final_remaining_balance
 
-def setup_model(file_path='./data/updated_responses.xlsx'):
+# Largest number of salaries in one sweep
+SWEEP_MAX_SALARIES = int(os.environ.get('PIWEB_SWEEP_MAX_SALARIES', '200'))
+
+def sweep_expenses(model, salaries, regions, family_status, target_percentage, spending_preferences):
+    """
+    Predicts the expenses of one profile for every region and salary, as a single
+    predict_expenses_batch call over the regions x salaries matrix.
+
+    Args:
+        model: Trained ExpenseModel for predicting expenses.
+        salaries: Sequence of S monthly salaries (in DH).
+        regions: Sequence of R region names, all known to the model.
+        family_status: User's family status (Single/Married).
+        target_percentage: Percentage of salary the user wants to save as remaining balance.
+        spending_preferences: Array of shape (4,) of spending preference weights.
+
+    Returns:
+        adjusted_expenses: Array of shape (R, S, 4) of adjusted predicted expenses.
+        final_remaining_balance: Array of shape (R, S) of remaining balances.
+    """
+    salaries = np.asarray(salaries, dtype=float)
+    rows = len(regions) * len(salaries)
+    adjusted_expenses, final_remaining_balance = predict_expenses_batch(
+        model, np.tile(salaries, len(regions)), [region for region in regions for _ in salaries],
+        [family_status] * rows, np.full(rows, float(target_percentage)), spending_preferences
+    )
+    return (adjusted_expenses.reshape(len(regions), len(salaries), -1),
+            final_remaining_balance.reshape(len(regions), len(salaries)))
+
+def parse_spending_preferences(rent, utilities, transport, food):
+    """
+    Converts the four preference levels (high/medium/low) into an array of weights.
+    Unknown levels count as medium.
+    """
+    return np.array([
+        PREFERENCE_MAPPING.get(str(level).lower(), 1.0)
+        for level in (rent, utilities, transport, food)
+    ])
+
+def setup_model(file_path=None):
     """
     Loads the dataset, preprocesses it, and trains the model.
 
+    With the default shared dataset, the model is loaded from its artifact when one matches
+    the dataset fingerprint, and trained and saved otherwise (see artifacts.py).
+
     Args:
-        file_path: Path to the dataset file.
+        file_path: Path to the dataset file. Defaults to the shared cached dataset.
 
     Returns:
-        A trained machine learning model pipeline, or None if an error occurs.
+        A trained ExpenseModel, or None if an error occurs.
     """
     try:
+        if file_path is None:
+            return load_or_train('expense_model', lambda: train_expense_model(get_raw_data()))
+
         # Load the dataset
-        data = pd.read_excel('./data/updated_responses.xlsx')
+        import pandas as pd
+        data = pd.read_excel(file_path)
 
         if data is None:
             raise ValueError("Failed to load data. Check the file path or data format.")
 
-        # Preprocess the dataset
-        processed_data = preprocess_data(data)
-
-        # Train the model
-        model = train_model(processed_data)
-
-        return model
+        return train_expense_model(data)
     except Exception as e:
-        print(f"Error setting up the model: {e}")
+        logger.error(f"Error setting up the model: {e}")
         return None
 
+def train_expense_model(data):
+    """
+    Preprocesses the raw dataset, trains the expense model on it and exports it for serving.
+    """
+    # Preprocess the dataset
+    processed_data = preprocess_data(data)
+
+    # Train the model, then flatten it into NumPy arrays
+    return export_expense_model(train_model(processed_data))
+
 def train_model(data):
     """
     Trains a Linear Regression model to predict expenses based on user inputs.
+    Returns the scikit-learn pipeline (see export_expense_model for the served model).
     """
+    from sklearn.compose import ColumnTransformer
+    from sklearn.linear_model import LinearRegression
+    from sklearn.model_selection import train_test_split
+    from sklearn.pipeline import Pipeline
+    from sklearn.preprocessing import OneHotEncoder, StandardScaler
+
     # Features and target
     X = data[['Salaire (DH)', 'Région', 'Family status']]
     y = data[['Loyer (DH)', 'Factures Mensuelles (DH)', 'Perte Mensuelle Transport (DH)', 'Dépenses Alimentaires (DH)']]
@@ -285,7 +584,7 @@ def train_model(data):
     ])
 
     # Train-test split
-    X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
+    X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=TRAINING_SEED)
 
     # Train the model
     model.fit(X_train, y_train)
@@ -298,39 +597,21 @@ def preprocess_data(data):
     Preprocesses the dataset by handling non-numeric values, encoding categorical variables,
     and normalizing numerical features.
     """
-    # Handle non-numeric values in relevant columns
-    def convert_to_numeric(value):
-        """
-        Converts a string value with ranges or non-numeric characters into a numeric value.
-        Handles cases like '5000-10000DH', 'Moins de 500 dh', 'Plus de 2500 dh', '0 dh'.
-        """
-        if isinstance(value, str):
-            value = value.lower().replace('dh', '').strip()  # Remove 'DH' and extra spaces
-            if 'plus de' in value:
-                return float(value.replace('plus de', '').strip())
-            elif 'moins de' in value:
-                return float(value.replace('moins de', '').strip())
-            elif '-' in value:  # Handle ranges like '5000-10000'
-                low, high = map(float, value.split('-'))
-                return (low + high) / 2
-            try:
-                return float(value)  # Convert to float if possible
-            except ValueError:
-                return np.nan  # Return NaN if conversion fails
-        return value  # Return the value as is if it's already numeric
-
-    # Apply the conversion function to relevant columns
+    # Convert the monetary columns (unparseable answers become NaN, then 0 below)
     columns_to_convert = ['Salaire (DH)', 'Factures Mensuelles (DH)', 'Dépenses Alimentaires (DH)',
                           'Loyer (DH)', 'Perte Mensuelle Transport (DH)']  # Add other relevant columns
     for col in columns_to_convert:
-        data[col] = data[col].apply(convert_to_numeric)
+        data[col] = parse_currency_series(data[col], fallback=np.nan)
+
+    # Handle missing values (e.g., replace NaN with 0 or column mean). Only the numeric
+    # columns: string columns cannot hold 0, and appended responses may leave answers blank
+    numeric_columns = data.select_dtypes('number').columns
+    data[numeric_columns] = data[numeric_columns].fillna(0)
 
-    # Handle missing values (e.g., replace NaN with 0 or column mean)
-    data.fillna(0, inplace=True)
+    # Responses without a region or family status cannot be used for training
+    data.dropna(subset=['Région', 'Situation Familiale'], inplace=True)
 
     # Encode categorical variables
-    data['Family status'] = data['Situation Familiale'].replace({
-        'Divorcé': 'Single', 'Célibataire': 'Single', 'Marié': 'Married', 'Celibataire': 'Single'
-    })
+    data['Family status'] = data['Situation Familiale'].replace(FAMILY_STATUS_MAPPING)
 
     return data
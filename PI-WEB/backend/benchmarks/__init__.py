@@ -0,0 +1,3 @@
+"""
+Benchmarks for the routes and the utility hot paths (see benchmarks/bench.py).
+"""
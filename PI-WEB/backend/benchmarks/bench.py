@@ -0,0 +1,225 @@
+"""
+Benchmark harness for the routes and the utility hot paths.
+
+For each survey size, a synthetic survey shaped like updated_responses.xlsx is imported
+into a temporary columnar dataset, the app is switched to it and the models are retrained.
+The routes are then timed through Flask's test client, and the utilities directly.
+
+Usage, from the backend directory:
+
+    python -m benchmarks.bench --sizes 1000 100000 1000000 --output bench.json
+    python -m benchmarks.compare baseline.json bench.json
+
+Response caches are disabled unless --cache is given, so that the routes measure the
+computation and not the cache.
+"""
+import argparse
+import hashlib
+import importlib.metadata
+import json
+import os
+import platform
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+
+def summarize(latencies):
+    """
+    Returns latency percentiles (in milliseconds) and throughput for a list of durations in seconds.
+    """
+    latencies = np.asarray(latencies, dtype=float)
+    total = latencies.sum()
+    return {
+        "count": int(latencies.size),
+        "mean_ms": float(latencies.mean() * 1000),
+        "p50_ms": float(np.percentile(latencies, 50) * 1000),
+        "p90_ms": float(np.percentile(latencies, 90) * 1000),
+        "p99_ms": float(np.percentile(latencies, 99) * 1000),
+        "min_ms": float(latencies.min() * 1000),
+        "max_ms": float(latencies.max() * 1000),
+        "throughput_per_s": float(latencies.size / total) if total > 0 else None,
+    }
+
+
+def measure(fn, repeat, warmup=1, setup=None):
+    """
+    Times `fn(setup())` `repeat` times after `warmup` untimed calls. Setup is not timed.
+    """
+    latencies = []
+    for i in range(warmup + repeat):
+        arg = setup() if setup is not None else None
+        start = time.perf_counter()
+        fn(arg)
+        elapsed = time.perf_counter() - start
+        if i >= warmup:
+            latencies.append(elapsed)
+    return summarize(latencies)
+
+
+def bench_routes(client, regions, requests, seed):
+    """
+    Times the prediction routes with randomized, seeded inputs.
+    """
+    from app.utils import REGION_MAPPING, FAMILY_STATUSES
+
+    rng = random.Random(seed)
+    levels = ['high', 'medium', 'low']
+
+    def display_results(_):
+        response = client.post('/display_results', json={
+            'region': rng.choice(list(REGION_MAPPING)), 'family_status': rng.choice(FAMILY_STATUSES)
+        })
+        assert response.status_code in (200, 404), response.status_code
+
+    def display_results_by_mini_form(_):
+        response = client.get('/display_results_byMiniForm', query_string={
+            'salary': rng.uniform(0, 20000), 'family_status': rng.choice(FAMILY_STATUSES)
+        })
+        assert response.status_code == 200, response.get_json()
+
+    def submit(_):
+        response = client.post('/submit', data={
+            'salary': rng.uniform(0, 20000), 'region': rng.choice(regions),
+            'family_status': rng.choice(FAMILY_STATUSES), 'savings': rng.choice(['0', '10', '25', '50']),
+            'rent': rng.choice(levels), 'utilities': rng.choice(levels),
+            'transport': rng.choice(levels), 'food': rng.choice(levels),
+        })
+        assert response.status_code == 200, response.get_json()
+
+    return {
+        "/display_results": measure(display_results, requests, warmup=5),
+        "/display_results_byMiniForm": measure(display_results_by_mini_form, requests, warmup=5),
+        "/submit": measure(submit, requests, warmup=5),
+    }
+
+
+def bench_utils(raw, manifest, models, repeat, calls, seed):
+    """
+    Times the utility hot paths on a raw synthetic survey.
+    """
+    import pandas as pd
+
+    from app.dataset import MONEY_COLUMNS, read_columnar
+    from app.utils import (FAMILY_STATUSES, convert_currency_to_avg, parse_currency_series, predict_expenses,
+                           predict_expenses_batch, predict_region, preprocess_data, train_model, train_region_model)
+
+    rng = random.Random(seed)
+    regions = sorted(raw['Région'].dropna().unique())
+    processed = preprocess_data(raw.copy())
+    money_columns = [col for col in MONEY_COLUMNS if col in raw.columns and not pd.api.types.is_numeric_dtype(raw[col])]
+    scalar_values = raw[money_columns[0]].head(calls).tolist()
+    preferences = np.array([1.5, 1.0, 0.5, 1.0])
+    batch_size = 1000
+
+    return {
+        "read_columnar": measure(lambda _: read_columnar(manifest), repeat),
+        "parse_currency_series": measure(lambda _: [parse_currency_series(raw[col]) for col in money_columns], repeat),
+        "convert_currency_to_avg": measure(lambda _: [convert_currency_to_avg(value) for value in scalar_values], repeat),
+        "preprocess_data": measure(preprocess_data, repeat, setup=raw.copy),
+        "train_model": measure(lambda _: train_model(processed), repeat),
+        "train_region_model": measure(lambda _: train_region_model(raw), repeat),
+        "predict_expenses": measure(lambda _: predict_expenses(
+            models.expense_model, rng.uniform(0, 20000), rng.choice(regions), rng.choice(FAMILY_STATUSES), 10.0, preferences
+        ), calls, warmup=5),
+        "predict_expenses_batch_1000": measure(lambda _: predict_expenses_batch(
+            models.expense_model, np.linspace(0, 20000, batch_size), [rng.choice(regions) for _ in range(batch_size)],
+            [rng.choice(FAMILY_STATUSES) for _ in range(batch_size)], np.full(batch_size, 10.0), preferences
+        ), repeat),
+        "predict_region": measure(lambda _: predict_region(
+            rng.uniform(0, 20000), rng.choice(FAMILY_STATUSES), model=models.region_model, version=models.version,
+            surface=models.region_surface
+        ), calls, warmup=5),
+        "predict_region_exact": measure(lambda _: predict_region(
+            rng.uniform(0, 20000), rng.choice(FAMILY_STATUSES), model=models.region_model, version=models.version
+        ), calls, warmup=5),
+    }
+
+
+def git_commit():
+    """
+    Returns the current git commit, or None outside a git checkout.
+    """
+    try:
+        return subprocess.check_output(['git', 'rev-parse', 'HEAD'], stderr=subprocess.DEVNULL, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the routes and utility hot paths on synthetic surveys.")
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 100000, 1000000], help='Survey sizes in rows.')
+    parser.add_argument('--requests', type=int, default=200, help='Timed requests per route.')
+    parser.add_argument('--calls', type=int, default=200, help='Timed calls per single-row utility.')
+    parser.add_argument('--repeat', type=int, default=3, help='Timed runs per dataset-wide utility.')
+    parser.add_argument('--seed', type=int, default=0, help='Random seed of the surveys and the inputs.')
+    parser.add_argument('--cache', action='store_true', help='Keep the response caches enabled.')
+    parser.add_argument('--output', default='bench.json', help='JSON file to write the results to.')
+    args = parser.parse_args(argv)
+
+    # Isolate the benchmark from the real dataset and artifacts, and configure the app
+    # before it is imported
+    work_dir = tempfile.mkdtemp(prefix='piweb-bench-')
+    os.environ['PIWEB_ARTIFACTS_DIR'] = os.path.join(work_dir, 'artifacts')
+    os.environ['PIWEB_DATASET_PATH'] = os.path.join(work_dir, 'initial', 'manifest.json')
+    os.environ['PIWEB_TRAINER_INTERVAL'] = '3600'
+    if not args.cache:
+        os.environ['PIWEB_CACHE_SIZE'] = '0'
+
+    try:
+        from app import create_app
+        from app.dataset import DATASET, import_dataframe
+        from app.trainer import TRAINER
+        from benchmarks.synthetic import load_template, synthetic_survey
+
+        template = load_template()
+        client = create_app().test_client()
+
+        results = {
+            "timestamp": time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+            "commit": git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "versions": {package: importlib.metadata.version(package)
+                         for package in ('numpy', 'pandas', 'scikit-learn', 'flask')},
+            "settings": vars(args),
+            "sizes": {},
+        }
+
+        for n_rows in args.sizes:
+            print(f"[INFO] Benchmarking {n_rows} rows")
+            raw = synthetic_survey(n_rows, template, seed=args.seed)
+            manifest = os.path.join(work_dir, str(n_rows), 'manifest.json')
+            digest = hashlib.sha256(f"synthetic:{n_rows}:{args.seed}".encode()).hexdigest()
+
+            start = time.perf_counter()
+            import_dataframe(raw, manifest, digest)
+            import_seconds = time.perf_counter() - start
+
+            DATASET.switch(manifest)
+            start = time.perf_counter()
+            TRAINER.refresh()
+            refresh_seconds = time.perf_counter() - start
+
+            regions = sorted(raw['Région'].dropna().unique())
+            results["sizes"][str(n_rows)] = {
+                "import_seconds": import_seconds,
+                "train_seconds": refresh_seconds,
+                "routes": bench_routes(client, regions, args.requests, args.seed),
+                "utils": bench_utils(raw, manifest, TRAINER.current, args.repeat, args.calls, args.seed),
+            }
+
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+    print(f"[INFO] Results written to {args.output}")
+
+
+if __name__ == '__main__':
+    sys.exit(main())
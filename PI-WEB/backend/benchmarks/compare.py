@@ -0,0 +1,52 @@
+"""
+Compares two benchmark result files written by benchmarks/bench.py.
+
+Usage, from the backend directory:
+
+    python -m benchmarks.compare baseline.json candidate.json [--threshold 1.2]
+
+Prints the p50 latency of every benchmark present in both files and the candidate/baseline
+ratio, and exits with status 1 if any ratio exceeds the threshold.
+"""
+import argparse
+import json
+import sys
+
+
+def p50_by_name(results):
+    """
+    Flattens a result file into {(size, group, name): p50 in ms}.
+    """
+    flat = {}
+    for size, groups in results["sizes"].items():
+        for group in ('routes', 'utils'):
+            for name, stats in groups.get(group, {}).items():
+                flat[(size, group, name)] = stats["p50_ms"]
+    return flat
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare two benchmark result files.")
+    parser.add_argument('baseline')
+    parser.add_argument('candidate')
+    parser.add_argument('--threshold', type=float, default=1.2, help='Ratio above which a benchmark regressed.')
+    args = parser.parse_args(argv)
+
+    with open(args.baseline, encoding='utf-8') as f:
+        baseline = p50_by_name(json.load(f))
+    with open(args.candidate, encoding='utf-8') as f:
+        candidate = p50_by_name(json.load(f))
+
+    regressions = 0
+    print(f"{'size':>8}  {'benchmark':<36} {'baseline p50':>14} {'candidate p50':>14} {'ratio':>7}")
+    for key in sorted(baseline.keys() & candidate.keys(), key=lambda k: (int(k[0]), k[1], k[2])):
+        size, _, name = key
+        ratio = candidate[key] / baseline[key] if baseline[key] > 0 else float('inf')
+        flag = '  REGRESSION' if ratio > args.threshold else ''
+        regressions += bool(flag)
+        print(f"{size:>8}  {name:<36} {baseline[key]:>12.3f}ms {candidate[key]:>12.3f}ms {ratio:>7.2f}{flag}")
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
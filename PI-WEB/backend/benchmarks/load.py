@@ -0,0 +1,104 @@
+"""
+Load generator for a running server: concurrent clients send the prediction routes for a
+fixed duration, then the throughput and the latency percentiles are reported.
+
+Usage, from the backend directory, against the dev server and the pre-fork server:
+
+    python run.py &
+    python -m benchmarks.load --url http://127.0.0.1:5000 --clients 16 --duration 20
+
+    python serve.py --workers 4 --port 8000 &
+    python -m benchmarks.load --url http://127.0.0.1:8000 --clients 16 --duration 20
+
+Each client is a separate process, so the load generator is not limited by the GIL.
+"""
+import argparse
+import http.client
+import json
+import multiprocessing
+import random
+import sys
+import time
+import urllib.parse
+
+from benchmarks.bench import summarize
+
+FAMILY_STATUSES = ['Married', 'Single']
+LEVELS = ['high', 'medium', 'low']
+
+
+def request(connection, rng, regions):
+    """
+    Sends one randomly chosen prediction request. Returns the HTTP status.
+    """
+    route = rng.choice(['/display_results', '/display_results_byMiniForm', '/submit'])
+    if route == '/display_results':
+        body = json.dumps({'region': rng.randint(1, 12), 'family_status': rng.choice(FAMILY_STATUSES)})
+        connection.request('POST', route, body, {'Content-Type': 'application/json'})
+    elif route == '/display_results_byMiniForm':
+        query = urllib.parse.urlencode({'salary': rng.uniform(0, 20000), 'family_status': rng.choice(FAMILY_STATUSES)})
+        connection.request('GET', f"{route}?{query}")
+    else:
+        body = urllib.parse.urlencode({
+            'salary': rng.uniform(0, 20000), 'region': rng.choice(regions),
+            'family_status': rng.choice(FAMILY_STATUSES), 'savings': rng.choice(['0', '10', '25']),
+            'rent': rng.choice(LEVELS), 'utilities': rng.choice(LEVELS),
+            'transport': rng.choice(LEVELS), 'food': rng.choice(LEVELS),
+        })
+        connection.request('POST', route, body, {'Content-Type': 'application/x-www-form-urlencoded'})
+    response = connection.getresponse()
+    response.read()
+    return response.status
+
+
+def client(args):
+    url, deadline, seed, regions = args
+    target = urllib.parse.urlsplit(url)
+    rng = random.Random(seed)
+    latencies, errors = [], 0
+    while time.time() < deadline:
+        # One connection per request: the servers close it after each response (HTTP/1.0)
+        connection = http.client.HTTPConnection(target.hostname, target.port, timeout=30)
+        start = time.perf_counter()
+        try:
+            status = request(connection, rng, regions)
+        except OSError:
+            status = None
+        finally:
+            connection.close()
+        latencies.append(time.perf_counter() - start)
+        # 404 is a valid answer for regions without data
+        if status is None or status >= 500:
+            errors += 1
+    return latencies, errors
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Measure the throughput of a running server.")
+    parser.add_argument('--url', default='http://127.0.0.1:8000', help='Base URL of the server.')
+    parser.add_argument('--clients', type=int, default=16, help='Concurrent client processes.')
+    parser.add_argument('--duration', type=float, default=20.0, help='Seconds of load.')
+    parser.add_argument('--seed', type=int, default=0, help='Random seed of the inputs.')
+    args = parser.parse_args(argv)
+
+    # Regions the expense model knows, from the preloaded averages
+    target = urllib.parse.urlsplit(args.url)
+    connection = http.client.HTTPConnection(target.hostname, target.port, timeout=30)
+    connection.request('GET', '/display_results_all')
+    regions = [region['name'] for region in json.loads(connection.getresponse().read())['regions'].values()
+               if any(region['averages'].values())]
+    connection.close()
+
+    deadline = time.time() + args.duration
+    with multiprocessing.Pool(args.clients) as pool:
+        results = pool.map(client, [(args.url, deadline, args.seed + i, regions) for i in range(args.clients)])
+
+    latencies = [latency for client_latencies, _ in results for latency in client_latencies]
+    summary = summarize(latencies)
+    summary["throughput_per_s"] = len(latencies) / args.duration
+    summary["errors"] = sum(errors for _, errors in results)
+    print(json.dumps(summary, indent=2))
+
+
+if __name__ == '__main__':
+    sys.exit(main())
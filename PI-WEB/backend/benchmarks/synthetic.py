@@ -0,0 +1,40 @@
+import numpy as np
+import pandas as pd
+
+from app.dataset import SOURCE_PATH
+
+# Integer-valued answers that get a random jitter, so that rows are not exact duplicates
+JITTER_COLUMNS = ['Loyer (DH)', 'Factures Mensuelles (DH)']
+
+
+def load_template(source=SOURCE_PATH):
+    """
+    Loads the survey workbook used as the template of the synthetic surveys.
+    """
+    template = pd.read_excel(source)
+    template.columns = template.columns.str.strip()
+    return template
+
+
+def synthetic_survey(n_rows, template=None, seed=0):
+    """
+    Generates a raw survey of `n_rows` rows shaped like updated_responses.xlsx.
+
+    Rows are resampled from the template workbook, which keeps its columns, its string
+    answers ("500-1000 dh", "Plus de 2500 dh", ...) and the correlations between answers.
+    The integer amounts get a +/-10% jitter.
+
+    Args:
+        n_rows: Number of rows to generate.
+        template: Raw survey to resample. Defaults to the workbook in data/.
+        seed: Random seed, for reproducible surveys.
+    """
+    if template is None:
+        template = load_template()
+    rng = np.random.default_rng(seed)
+    data = template.iloc[rng.integers(0, len(template), n_rows)].reset_index(drop=True)
+    for col in JITTER_COLUMNS:
+        if col in data.columns and pd.api.types.is_numeric_dtype(data[col]):
+            jitter = rng.uniform(0.9, 1.1, n_rows)
+            data[col] = np.round(data[col].to_numpy() * jitter).astype(data[col].dtype)
+    return data
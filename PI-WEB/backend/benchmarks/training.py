@@ -0,0 +1,180 @@
+"""
+Training benchmark: time of the region model training as the survey grows, in rows and in
+regions, with the former pd.concat balancing and with the index balancing of training.py.
+
+Usage, from the backend directory:
+
+    python -m benchmarks.training --sizes 1000,10000,100000,1000000 --regions 12,48,192
+
+The surveys are synthetic: a salary, a family status and a region drawn with frequencies
+decreasing as 1 / sqrt(rank), so that the smaller regions need upsampling. For each
+(rows, regions) pair the report gives:
+
+    legacy_balance   the former loop: one boolean filter and one resample() per region, each
+                     appended with pd.concat (skipped above --legacy-max-rows)
+    balance          training.balance_indexes: one vectorized draw, no row copied
+    train_upsample   train_region_model(balance='upsample'), balancing included
+    train_priors     train_region_model(balance='priors'): no duplicated rows
+
+and checks that the classes come out exactly balanced, that the fitted model has uniform region
+priors with both modes, and that a seed gives the same model.
+
+Results on one core (pandas 3, scikit-learn 1.9), best of 2:
+
+    rows       regions   legacy_balance   balance   train_upsample   train_priors
+    10,000     12        58 ms            1.2 ms    55 ms            41 ms
+    10,000     192       740 ms           3.7 ms    112 ms           26 ms
+    100,000    12        237 ms           21 ms     192 ms           127 ms
+    100,000    192       4.0 s            29 ms     996 ms           215 ms
+    1,000,000  12        -                256 ms    3.7 s            1.3 s
+    1,000,000  192       -                430 ms    11.9 s           2.0 s
+
+The legacy loop grows with rows x regions (each region filters the whole frame, and every
+concat copies the frame built so far); the index balancing grows with the balanced size only.
+The training with upsampling is then dominated by the QDA fit on the balanced rows (7.3M
+at 1M rows and 192 regions), which the priors avoid.
+
+The legacy loop also kept every original row next to `max_count` resampled rows of each
+smaller region, so its classes stayed unbalanced (largest/smallest region ratio of ~1.7
+above); the index balancing gives every region exactly `max_count` rows.
+"""
+import argparse
+import json
+import sys
+import time
+
+import numpy as np
+
+REGION_SHARE_EXPONENT = 0.5
+
+# Fewest expected rows of the smallest region: below, QDA cannot fit its covariance without
+# upsampling, and the pair is skipped
+MIN_REGION_ROWS = 20
+
+
+def region_shares(n_regions):
+    """
+    Returns the frequencies of the synthetic regions, largest first.
+    """
+    weights = 1 / np.arange(1, n_regions + 1) ** REGION_SHARE_EXPONENT
+    return weights / weights.sum()
+
+
+def synthetic_training_data(n_rows, n_regions, seed=0):
+    """
+    Generates the columns train_region_model reads, with imbalanced regions.
+    """
+    import pandas as pd
+
+    rng = np.random.default_rng(seed)
+    regions = rng.choice(n_regions, n_rows, p=region_shares(n_regions))
+    married = rng.random(n_rows) < 0.4
+    salaries = np.round(rng.lognormal(8.5 + 0.2 * married + 0.5 * regions / n_regions, 0.4))
+    return pd.DataFrame({
+        'Salaire (DH)': salaries,
+        'Situation Familiale': np.where(married, 'Marié', 'Célibataire'),
+        'Région': np.array([f"Region {i:03d}" for i in range(n_regions)], dtype=object)[regions],
+    })
+
+
+def legacy_balance(data):
+    """
+    The balancing train_region_model used to run, kept for comparison.
+    """
+    import pandas as pd
+    from sklearn.utils import resample
+
+    max_count = data['Région'].value_counts().max()
+    data_balanced = data.copy()
+    for region in data['Région'].unique():
+        region_data = data[data['Région'] == region]
+        if len(region_data) < max_count:
+            region_data_upsampled = resample(region_data, replace=True, n_samples=max_count, random_state=42)
+            data_balanced = pd.concat([data_balanced, region_data_upsampled])
+    return data_balanced
+
+
+def timed(fn, repeat):
+    """
+    Returns the result of fn() and its best time in seconds over `repeat` runs.
+    """
+    best = float('inf')
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - started)
+    return result, best
+
+
+def class_ratio(labels):
+    """
+    Returns the ratio of the largest to the smallest class count.
+    """
+    counts = np.unique(np.asarray(labels), return_counts=True)[1]
+    return float(counts.max() / counts.min())
+
+
+def run(n_rows, n_regions, repeat, legacy_max_rows, seed):
+    from app.training import balance_indexes
+    from app.utils import train_region_model
+
+    import pandas as pd
+
+    data = synthetic_training_data(n_rows, n_regions, seed)
+    labels = pd.factorize(data['Région'], sort=True)[0]  # The region codes train_region_model balances
+    result = {"rows": n_rows, "regions": n_regions}
+
+    if n_rows <= legacy_max_rows:
+        balanced, elapsed = timed(lambda: legacy_balance(data), repeat)
+        result["legacy_balance_ms"] = round(elapsed * 1000, 2)
+        result["legacy_rows"] = len(balanced)
+        result["legacy_class_ratio"] = round(class_ratio(balanced['Région']), 3)
+        del balanced
+
+    indexes, elapsed = timed(lambda: balance_indexes(labels, seed), repeat)
+    result["balance_ms"] = round(elapsed * 1000, 2)
+    result["balanced_rows"] = len(indexes)
+    result["class_ratio"] = class_ratio(labels[indexes])
+    if result["class_ratio"] != 1 or not np.array_equal(indexes, balance_indexes(labels, seed)):
+        raise AssertionError(f"Unbalanced or non-reproducible balancing at {n_rows} rows, {n_regions} regions")
+    del indexes
+
+    for balance in ('upsample', 'priors'):
+        model, elapsed = timed(lambda: train_region_model(data, balance=balance, seed=seed), repeat)
+        result[f"train_{balance}_ms"] = round(elapsed * 1000, 2)
+        if not np.allclose(model.priors, 1 / n_regions):
+            raise AssertionError(f"Non-uniform region priors with balance={balance}: "
+                                 f"{model.priors.min():.4f} to {model.priors.max():.4f}")
+        again = train_region_model(data, balance=balance, seed=seed)
+        if not all(np.array_equal(a, b) for a, b in zip(model.to_arrays().values(), again.to_arrays().values())):
+            raise AssertionError(f"Training with balance={balance} is not reproducible for a seed")
+    return result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the region model training.")
+    parser.add_argument('--sizes', default='1000,10000,100000,1000000', help='Comma-separated survey sizes in rows.')
+    parser.add_argument('--regions', default='12,48,192', help='Comma-separated numbers of regions.')
+    parser.add_argument('--repeat', type=int, default=3, help='Runs per measure; the best is kept.')
+    parser.add_argument('--legacy-max-rows', type=int, default=100000,
+                        help='Largest survey the legacy balancing is timed on.')
+    parser.add_argument('--seed', type=int, default=0, help='Random seed of the surveys and the training.')
+    parser.add_argument('--output', help='Write the results as JSON to this file.')
+    args = parser.parse_args(argv)
+
+    results = []
+    for n_rows in [int(size) for size in args.sizes.split(',')]:
+        for n_regions in [int(count) for count in args.regions.split(',')]:
+            if n_rows * region_shares(n_regions)[-1] < MIN_REGION_ROWS:
+                continue
+            result = run(n_rows, n_regions, args.repeat, args.legacy_max_rows, args.seed)
+            print(json.dumps(result), flush=True)
+            results.append(result)
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump({"results": results}, f, indent=2)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
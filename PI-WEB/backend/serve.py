@@ -0,0 +1,276 @@
+"""
+Production entry point: a pre-fork WSGI server for the app.
+
+run.py starts Flask's development server (one process, debugger and reloader). This launcher
+instead loads the dataset, loads or trains the models and builds the derived tables once in a
+master process, then forks the workers. The workers inherit all of it copy-on-write: nothing is
+loaded, trained or copied per worker, and the memory of the models and tables is shared.
+
+Usage, from the backend directory:
+
+    python serve.py --workers 4 --port 8000
+    PIWEB_WORKERS=4 PIWEB_PORT=8000 python serve.py
+
+Each worker is a single-threaded process accepting from the shared listening socket, so the
+worker count is the number of requests served in parallel (one per core is a good start).
+
+With --threaded (PIWEB_THREADED=1), each worker accepts every connection on its own thread
+and the model and dataset work runs on the bounded executors of app/executor.py: a full pool
+answers 429 with Retry-After and a slow task 504 after PIWEB_REQUEST_TIMEOUT seconds, and slow
+map clicks cannot hold the threads of /submit.
+
+Probes: /healthz (liveness, the worker answers) and /readyz (readiness, models are loaded).
+
+Reload: the master checks the dataset version every PIWEB_TRAINER_INTERVAL seconds (or on
+SIGHUP). When it changed, the models are retrained in the master while the current workers
+keep serving the previous ones, then a new generation of workers is forked and the old workers
+are stopped gracefully: each one finishes its current request and exits.
+
+Signals: SIGTERM/SIGINT stop the server gracefully, SIGHUP forces a reload.
+
+Each worker keeps its own response caches and /metrics counters.
+
+Throughput (benchmarks/load.py, 16 concurrent clients, mixed prediction routes, 172-row
+survey, on a single-core machine; the client shares the core):
+
+    run.py (dev server)           ~215 req/s   p50 71 ms   p99 144 ms
+    serve.py --workers 1          ~270 req/s   p50 58 ms   p99 98 ms
+    serve.py --workers 4          ~235 req/s   p50 64 ms   p99 129 ms
+
+On one core the workers cannot run in parallel: the gain over the dev server comes from the
+request path without debugger and thread per request, and extra workers only add context
+switches. On a multi-core machine, throughput grows with the worker count up to the number of
+cores, which the dev server (one process, bound by the GIL) cannot use.
+"""
+import argparse
+import gc
+import logging
+import os
+import signal
+import socket
+import sys
+import time
+
+from werkzeug.serving import make_server
+
+from app import create_app
+from app.dataset import DATASET
+from app.trainer import TRAINER, TRAINER_INTERVAL
+from app.utils import get_averages_table
+
+logger = logging.getLogger('app.serve')
+
+HOST = os.environ.get('PIWEB_HOST', '0.0.0.0')
+PORT = int(os.environ.get('PIWEB_PORT', '8000'))
+
+# Number of worker processes (defaults to the number of cores)
+WORKERS = int(os.environ.get('PIWEB_WORKERS', str(os.cpu_count() or 1)))
+
+# Seconds given to a stopping worker to finish its current request before it is killed
+GRACEFUL_TIMEOUT = float(os.environ.get('PIWEB_GRACEFUL_TIMEOUT', '30'))
+
+# Thread per connection in the workers, with the work bounded by the executors
+THREADED = os.environ.get('PIWEB_THREADED', '0') == '1'
+
+# Pending connections queued by the kernel on the listening socket
+BACKLOG = int(os.environ.get('PIWEB_BACKLOG', '2048'))
+
+
+def warm_up():
+    """
+    Loads the dataset, the models and the derived tables in the current process.
+    Errors are logged: the workers then report them on /readyz and /model_status.
+    """
+    try:
+        TRAINER.refresh()
+    except Exception:
+        pass  # Recorded in TRAINER.status()
+    try:
+        get_averages_table()
+    except Exception as e:
+        logger.error(f"Could not build the averages table: {e}")
+
+    # The models and tables are built: the workers do not need the raw survey frame
+    DATASET.release()
+    # Keep the garbage collector from touching, and so copying, the objects shared with the workers
+    gc.collect()
+    gc.freeze()
+
+
+def run_worker(app, listener, host, port, access_log=False, threaded=False):
+    """
+    Serves requests from the shared listening socket, one at a time or on a thread each,
+    until SIGTERM/SIGINT or until the master exits. In-flight requests are completed.
+    """
+    stopping = []
+    signal.signal(signal.SIGTERM, lambda signum, frame: stopping.append(signum))
+    signal.signal(signal.SIGINT, lambda signum, frame: stopping.append(signum))
+    signal.signal(signal.SIGHUP, signal.SIG_IGN)
+    if not access_log:
+        logging.getLogger('werkzeug').setLevel(logging.WARNING)
+
+    server = make_server(host, port, app, threaded=threaded, fd=listener.fileno())
+    server.timeout = 0.5  # Bounds the time to notice a stop request
+    if threaded:
+        # Let server_close() wait for the requests in flight
+        server.daemon_threads = False
+        server.block_on_close = True
+    master = os.getppid()
+    while not stopping and os.getppid() == master:
+        server.handle_request()
+    server.server_close()
+
+
+class Master:
+    """
+    Forks and supervises the workers, and reloads the models when the dataset changes.
+    """
+
+    def __init__(self, app, host=HOST, port=PORT, workers=WORKERS, interval=TRAINER_INTERVAL,
+                 graceful_timeout=GRACEFUL_TIMEOUT, access_log=False, threaded=THREADED):
+        self.app = app
+        self.host = host
+        self.port = port
+        self.workers = workers
+        self.interval = interval
+        self.graceful_timeout = graceful_timeout
+        self.access_log = access_log
+        self.threaded = threaded
+        self.generation = 0
+        self.children = {}  # pid -> generation
+        self.retiring = {}  # pid -> deadline
+        self.stopping = False
+        self.reload_requested = False
+        self.listener = None
+
+    def spawn(self):
+        pid = os.fork()
+        if pid == 0:
+            code = 0
+            try:
+                run_worker(self.app, self.listener, self.host, self.port, self.access_log, self.threaded)
+            except BaseException:
+                logger.exception("Worker crashed")
+                code = 1
+            finally:
+                os._exit(code)
+        self.children[pid] = self.generation
+
+    def spawn_missing(self):
+        current = sum(1 for generation in self.children.values() if generation == self.generation)
+        for _ in range(self.workers - current):
+            self.spawn()
+
+    def reap(self):
+        while True:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                return
+            if pid == 0:
+                return
+            generation = self.children.pop(pid, None)
+            self.retiring.pop(pid, None)
+            if generation == self.generation and not self.stopping:
+                logger.error(f"Worker {pid} exited unexpectedly (status {status}), restarting it")
+
+    def retire(self, pids):
+        deadline = time.monotonic() + self.graceful_timeout
+        for pid in pids:
+            self.retiring[pid] = deadline
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    def kill_overdue(self):
+        now = time.monotonic()
+        for pid, deadline in list(self.retiring.items()):
+            if now > deadline:
+                logger.error(f"Worker {pid} did not stop within {self.graceful_timeout:.0f}s, killing it")
+                try:
+                    os.kill(pid, signal.SIGKILL)
+                except ProcessLookupError:
+                    pass
+                self.retiring[pid] = float('inf')
+
+    def reload(self):
+        """
+        Retrains if the dataset changed (or on SIGHUP), then replaces the workers with a new
+        generation forked from the updated master.
+        """
+        forced, self.reload_requested = self.reload_requested, False
+        try:
+            swapped = TRAINER.refresh()
+        except Exception:
+            swapped = False  # Recorded in TRAINER.status(), the current workers keep serving
+        if not swapped and not forced:
+            return
+
+        warm_up()
+        old = [pid for pid, generation in self.children.items() if generation == self.generation]
+        self.generation += 1
+        self.spawn_missing()
+        self.retire(old)
+        logger.info(f"Reloaded: {self.workers} new workers, {len(old)} stopping")
+
+    def run(self):
+        self.listener = socket.create_server((self.host, self.port), backlog=BACKLOG)
+
+        def stop(signum, frame):
+            self.stopping = True
+
+        def request_reload(signum, frame):
+            self.reload_requested = True
+
+        signal.signal(signal.SIGTERM, stop)
+        signal.signal(signal.SIGINT, stop)
+        signal.signal(signal.SIGHUP, request_reload)
+
+        logger.info(f"Listening on http://{self.host}:{self.port} with {self.workers} workers (master {os.getpid()})")
+        next_check = time.monotonic() + self.interval
+        while not self.stopping:
+            self.reap()
+            self.kill_overdue()
+            if self.stopping:
+                break
+            self.spawn_missing()
+            if self.reload_requested or time.monotonic() >= next_check:
+                self.reload()
+                next_check = time.monotonic() + self.interval
+            time.sleep(0.2)
+
+        self.shutdown()
+
+    def shutdown(self):
+        logger.info("Stopping the workers")
+        self.retire([pid for pid in self.children if pid not in self.retiring])
+        while self.children:
+            self.reap()
+            self.kill_overdue()
+            time.sleep(0.05)
+        self.listener.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Pre-fork production server for the app.")
+    parser.add_argument('--host', default=HOST, help='Address to listen on.')
+    parser.add_argument('--port', type=int, default=PORT, help='Port to listen on.')
+    parser.add_argument('--workers', type=int, default=WORKERS, help='Number of worker processes.')
+    parser.add_argument('--reload-interval', type=float, default=TRAINER_INTERVAL,
+                        help='Seconds between two checks of the dataset version.')
+    parser.add_argument('--graceful-timeout', type=float, default=GRACEFUL_TIMEOUT,
+                        help='Seconds given to a stopping worker to finish its request.')
+    parser.add_argument('--access-log', action='store_true', help='Log every request.')
+    parser.add_argument('--threaded', action='store_true', default=THREADED,
+                        help='Serve each connection on a thread, with the work on the bounded executors.')
+    args = parser.parse_args(argv)
+
+    app = create_app(start_trainer=False)
+    warm_up()
+    Master(app, args.host, args.port, max(args.workers, 1), args.reload_interval,
+           args.graceful_timeout, args.access_log, args.threaded).run()
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,44 @@
+import os
+import tempfile
+
+import pytest
+
+# Settings read when the app modules are imported: keep the tests away from data/ and artifacts/
+WORK_DIR = tempfile.mkdtemp(prefix='piweb-tests-')
+os.environ.setdefault('PIWEB_DATASET_PATH', os.path.join(WORK_DIR, 'survey', 'manifest.json'))
+os.environ.setdefault('PIWEB_ARTIFACTS_DIR', os.path.join(WORK_DIR, 'artifacts'))
+os.environ.setdefault('PIWEB_APPEND_TOKEN', 'test-token')
+os.environ.setdefault('PIWEB_DATASET_CHECK_INTERVAL', '0')
+
+
+@pytest.fixture
+def dataset(tmp_path, monkeypatch):
+    """
+    Imports the survey workbook into a fresh columnar dataset and points DATASET to it, with
+    an empty artifacts directory. Returns the manifest path.
+    """
+    import app.artifacts
+    from app.dataset import DATASET, SOURCE_PATH, import_workbook
+
+    monkeypatch.setattr(app.artifacts, 'ARTIFACTS_DIR', str(tmp_path / 'artifacts'))
+
+    manifest = str(tmp_path / 'survey' / 'manifest.json')
+    import_workbook(SOURCE_PATH, manifest)
+    previous = DATASET.path
+    DATASET.switch(manifest)
+    yield manifest
+    DATASET.switch(previous)
+
+
+@pytest.fixture
+def client(dataset, monkeypatch):
+    """
+    Test client of an app serving models trained on the test dataset.
+    """
+    from app import create_app
+    from app.trainer import TRAINER, ModelTrainer
+
+    trainer = ModelTrainer()
+    trainer.refresh()
+    monkeypatch.setattr(TRAINER, 'current', trainer.current)
+    return create_app(start_trainer=False).test_client()
@@ -0,0 +1,36 @@
+def test_version_change_invalidates():
+    from app.cache import ResponseCache
+
+    cache = ResponseCache('test', max_size=4, ttl=0)
+    assert cache.get_or_compute('key', lambda: 1, version='a') == 1
+    assert cache.get_or_compute('key', lambda: 2, version='a') == 1
+    assert cache.get_or_compute('key', lambda: 3, version='b') == 3
+    assert cache.stats()["invalidations"] == 1
+
+
+def test_least_recently_used_is_evicted():
+    from app.cache import ResponseCache
+
+    cache = ResponseCache('test', max_size=2, ttl=0)
+    cache.get_or_compute('a', lambda: 'a')
+    cache.get_or_compute('b', lambda: 'b')
+    cache.get_or_compute('a', lambda: 'stale')  # 'b' is now the least recently used
+    cache.get_or_compute('c', lambda: 'c')
+    assert cache.get_or_compute('a', lambda: 'stale') == 'a'
+    assert cache.get_or_compute('b', lambda: 'new') == 'new'
+    assert cache.stats()["evictions"] == 2
+
+
+def test_entries_expire(monkeypatch):
+    import app.cache
+    from app.cache import ResponseCache
+
+    now = [100.0]
+    monkeypatch.setattr(app.cache.time, 'monotonic', lambda: now[0])
+    cache = ResponseCache('test', max_size=4, ttl=10)
+    cache.get_or_compute('key', lambda: 1)
+    now[0] += 9
+    assert cache.get_or_compute('key', lambda: 2) == 1
+    now[0] += 2
+    assert cache.get_or_compute('key', lambda: 2) == 2
+    assert cache.stats()["expirations"] == 1
@@ -0,0 +1,56 @@
+import numpy as np
+
+
+def test_expense_model_matches_the_pipeline(dataset):
+    from app.dataset import read_columnar
+    from app.inference import export_expense_model
+    from app.utils import preprocess_data, train_model
+
+    data = preprocess_data(read_columnar(dataset))
+    pipeline = train_model(data)
+    model = export_expense_model(pipeline)
+
+    features = data[['Salaire (DH)', 'Région', 'Family status']]
+    expected = pipeline.predict(features)
+    predicted = model.predict(features['Salaire (DH)'], features['Région'], features['Family status'])
+    assert np.array_equal(predicted, expected)
+
+
+def test_region_model_matches_the_qda(dataset, monkeypatch):
+    import app.utils
+    from app.dataset import read_columnar
+    from app.utils import train_region_model
+
+    # Keep the scikit-learn objects train_region_model exports
+    fitted = []
+    export = app.utils.export_region_model
+
+    def keep_fitted(*args):
+        fitted.extend(args)
+        return export(*args)
+
+    monkeypatch.setattr(app.utils, 'export_region_model', keep_fitted)
+    model = train_region_model(read_columnar(dataset))
+    label_encoder, scaler, qda, regions = fitted
+
+    salaries = np.linspace(0, 50000, 501)
+    for code in range(len(model.family_statuses)):
+        features = scaler.transform(np.column_stack([salaries, np.full(len(salaries), code, dtype=float)]))
+        assert np.array_equal(model.predict_proba_batch(salaries, code), qda.predict_proba(features))
+    assert list(model.classes_) == list(np.asarray(regions, dtype=object)[qda.classes_])
+
+
+def test_region_surface_stays_within_max_error(dataset):
+    from app.dataset import read_columnar
+    from app.surface import build_region_surface
+    from app.utils import train_region_model
+
+    model = train_region_model(read_columnar(dataset))
+    salaries = np.random.default_rng(0).uniform(0, 50000, 2000)
+    for step in (50, 200):
+        surface = build_region_surface(model, step=step, max_salary=50000)
+        for code, status in enumerate(surface.statuses):
+            looked_up = np.array([surface.lookup(salary, status) for salary in salaries])
+            # Up to the float32 rounding of the stored probabilities
+            assert np.abs(looked_up - model.predict_proba_batch(salaries, code)).max() <= surface.max_error + 1e-6
+    assert surface.lookup(50001, status) is None
@@ -0,0 +1,21 @@
+import os
+import pstats
+
+
+def test_request_profile_includes_executor_work(dataset, tmp_path, monkeypatch):
+    import app.metrics as metrics
+    from app import create_app
+
+    monkeypatch.setattr(metrics, 'PROFILE_SAMPLE_RATE', 1.0)
+    monkeypatch.setattr(metrics, 'PROFILE_SLOW_MS', 0.0)
+    profile_dir = tmp_path / 'profiles'
+    monkeypatch.setattr(metrics, 'PROFILE_DIR', str(profile_dir))
+
+    # The averages table is built on the data pool, not on the request thread
+    response = create_app(start_trainer=False).test_client().get('/display_results_all')
+    assert response.status_code == 200
+
+    (name,) = os.listdir(profile_dir)
+    functions = {function for _, _, function in pstats.Stats(str(profile_dir / name)).stats}
+    assert 'get_averages_table' in functions
+    assert 'averages_from_aggregates' in functions
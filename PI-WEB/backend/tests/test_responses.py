@@ -0,0 +1,154 @@
+import numpy as np
+import pytest
+
+RESPONSE = {
+    'Sexe': 'Femme',
+    'Situation Familiale': 'Célibataire',
+    'Région': 'Fès-Meknès',
+    'Loyer (DH)': 1500,
+    'Factures Mensuelles (DH)': 300,
+    'Perte Mensuelle Transport (DH)': 200,
+    'Dépenses Alimentaires (DH)': 1200,
+    'Salaire (DH)': 7000,
+}
+
+
+def test_append_rejects_responses_without_family_status(dataset):
+    from app.dataset import InvalidResponses, append_responses, read_manifest
+
+    rows = read_manifest(dataset)["rows"]
+    for status in (None, '', 'Veuf'):
+        with pytest.raises(InvalidResponses):
+            append_responses([RESPONSE, dict(RESPONSE, **{'Situation Familiale': status})], dataset)
+    with pytest.raises(InvalidResponses):
+        append_responses([dict(RESPONSE, **{'Région': None})], dataset)
+    assert read_manifest(dataset)["rows"] == rows
+
+    assert append_responses([RESPONSE, dict(RESPONSE, **{'Situation Familiale': 'Celibataire'})], dataset) == 2
+    assert read_manifest(dataset)["rows"] == rows + 2
+
+
+def test_region_training_skips_blank_and_unknown_family_statuses(dataset):
+    import pandas as pd
+    from app.dataset import read_columnar
+    from app.utils import train_region_model
+
+    data = read_columnar(dataset)
+    extra = pd.DataFrame([dict(RESPONSE, **{'Situation Familiale': status}) for status in (None, 'Veuf', ' Celibataire ')])
+    model = train_region_model(pd.concat([data, extra.reindex(columns=data.columns)], ignore_index=True))
+    assert set(model.family_statuses) == {'Married', 'Single'}
+    assert np.isclose(model.predict_proba(7000, 'Single').sum(), 1.0)
+
+
+def test_responses_route_rejects_invalid_rows_and_models_keep_refreshing(dataset):
+    from app import create_app
+    from app.dataset import DATASET
+    from app.trainer import ModelTrainer
+
+    client = create_app(start_trainer=False).test_client()
+    headers = {'Authorization': 'Bearer test-token'}
+
+    response = client.post('/responses', json={"responses": [dict(RESPONSE, **{'Situation Familiale': None})]},
+                           headers=headers)
+    assert response.status_code == 400
+    assert 'index 0' in response.get_json()["error"]
+
+    response = client.post('/responses', json={"responses": [RESPONSE]}, headers=headers)
+    assert response.status_code == 201
+
+    trainer = ModelTrainer()
+    assert trainer.refresh()
+    assert trainer.current.version == DATASET.version
+    assert trainer.status()["stale"] is False
+
+
+def test_missing_answers_read_back_as_missing(dataset):
+    from app.dataset import append_responses, read_columnar
+
+    append_responses([dict(RESPONSE, **{'Sexe': None})], dataset)
+    data = read_columnar(dataset)
+    assert data['Sexe'].isna().sum() == 1
+    assert not (data['Sexe'] == 'nan').any()
+
+
+def test_appends_are_compacted(dataset, monkeypatch):
+    import os
+
+    import app.dataset
+    from app.dataset import append_responses, read_columnar, read_manifest
+
+    monkeypatch.setattr(app.dataset, 'COMPACT_SEGMENTS', 4)
+    before = read_columnar(dataset)
+    for salary in range(20):
+        append_responses([dict(RESPONSE, **{'Salaire (DH)': salary})], dataset)
+
+    manifest = read_manifest(dataset)
+    assert all(len(column["files"]) <= 5 for column in manifest["columns"])
+    files = {name for name in os.listdir(os.path.dirname(dataset)) if name.endswith('.npy')}
+    assert files == {name for column in manifest["columns"] for name in column["files"]}
+
+    data = read_columnar(dataset)
+    assert len(data) == len(before) + 20
+    assert data['Salaire (DH)'].iloc[len(before):].tolist() == list(range(20))
+    assert data['Région'].iloc[:len(before)].equals(before['Région'])
+
+
+def test_append_command_checks_every_chunk_first(dataset, tmp_path):
+    import pandas as pd
+    from click.testing import CliRunner
+
+    from app.dataset import append_responses_command, read_manifest
+
+    path = tmp_path / 'responses.csv'
+    pd.DataFrame([RESPONSE] * 5 + [dict(RESPONSE, **{'Situation Familiale': None})]).to_csv(path, index=False)
+
+    rows = read_manifest(dataset)["rows"]
+    result = CliRunner().invoke(append_responses_command, [str(path), '--chunk-size', '2'])
+    assert result.exit_code != 0
+    assert 'index 5' in result.output
+    assert read_manifest(dataset)["rows"] == rows
+
+
+def test_derived_builds_outside_the_lock(dataset):
+    import threading
+
+    from app.dataset import DATASET
+
+    def build():
+        # Another thread reads the version while the value is built
+        reader = threading.Thread(target=lambda: DATASET.version)
+        reader.start()
+        reader.join(timeout=5)
+        return not reader.is_alive()
+
+    assert DATASET.derived('test', build)
+    assert DATASET.derived('test', lambda: False)
+
+
+def test_reimport_writes_new_files(dataset):
+    import os
+
+    from app.dataset import SOURCE_PATH, append_responses, import_workbook, read_columnar, read_manifest
+
+    append_responses([RESPONSE], dataset)
+    before = read_columnar(dataset)
+    files = {name for column in read_manifest(dataset)["columns"] for name in column["files"]}
+
+    # The frame read before the re-import stays readable: its memory-mapped files are not rewritten
+    import_workbook(SOURCE_PATH, dataset)
+    manifest = read_manifest(dataset)
+    assert files.isdisjoint(name for column in manifest["columns"] for name in column["files"])
+    assert len(before) == manifest["rows"] + 1
+    assert before['Salaire (DH)'].iloc[-1] == 7000.0
+    assert sorted(name for name in os.listdir(os.path.dirname(dataset)) if name.endswith('.npy')) == \
+        sorted(name for column in manifest["columns"] for name in column["files"])
+
+
+def test_missing_dataset_is_imported_at_its_path(tmp_path):
+    import os
+
+    from app.dataset import DATASET_PATH, DatasetCache, import_workbook
+
+    path = str(tmp_path / 'survey' / 'manifest.json')
+    assert len(DatasetCache(path, importer=import_workbook).get()) > 0
+    assert os.path.exists(path) and path != DATASET_PATH
@@ -0,0 +1,53 @@
+PROFILE = {"salary": 8000, "region": "Fès-Meknès", "family_status": "Single", "savings": "10%"}
+
+
+def test_submit_batch_rejects_unknown_regions_by_index(client):
+    response = client.post('/submit_batch', json={"profiles": [PROFILE, dict(PROFILE, region="Atlantis")]})
+    assert response.status_code == 400
+    assert "index 1" in response.get_json()["error"]
+
+    response = client.post('/submit_batch', json={"profiles": [dict(PROFILE, family_status="Divorced")]})
+    assert response.status_code == 400
+
+    response = client.post('/submit_batch', json={"profiles": [PROFILE, PROFILE]})
+    assert response.status_code == 200
+    assert len(response.get_json()["results"]) == 2
+
+
+def test_submit_batch_caps_the_number_of_profiles(client, monkeypatch):
+    import importlib
+
+    monkeypatch.setattr(importlib.import_module('app.routes'), 'BATCH_MAX_PROFILES', 3)
+    response = client.post('/submit_batch', json={"profiles": [PROFILE] * 4})
+    assert response.status_code == 400
+    assert client.post('/submit_batch', json={"profiles": [PROFILE] * 3}).status_code == 200
+
+
+def test_submit_sweep_rejects_unknown_family_statuses(client):
+    response = client.post('/submit_sweep', json=dict(PROFILE, family_status="Divorced"))
+    assert response.status_code == 400
+    assert "family status" in response.get_json()["error"]
+
+    response = client.post('/submit_sweep', json=PROFILE)
+    assert response.status_code == 200
+    assert "best_region_id" in response.get_json()
+
+
+def test_region_surface_etag_follows_the_grid_and_the_training_settings(client, monkeypatch):
+    import app.training as training
+    from app.surface import build_region_surface
+    from app.trainer import TRAINER
+
+    response = client.get('/region_surface')
+    assert response.status_code == 200
+    etag = response.headers['ETag']
+    assert client.get('/region_surface', headers={'If-None-Match': etag}).status_code == 304
+
+    models = TRAINER.current
+    coarser = build_region_surface(models.region_model, step=100)
+    assert coarser.etag(models.version) != models.region_surface.etag(models.version)
+
+    # The served surface keeps the settings it was built with, a surface built with others does not
+    monkeypatch.setattr(training, 'REGION_BALANCE', 'priors')
+    assert client.get('/region_surface', headers={'If-None-Match': etag}).status_code == 304
+    assert build_region_surface(models.region_model).etag(models.version) != models.region_surface.etag(models.version)
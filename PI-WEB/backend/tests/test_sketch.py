@@ -0,0 +1,21 @@
+import numpy as np
+
+
+def test_quantiles_within_relative_accuracy():
+    from app.sketch import QuantileSketch
+
+    values = np.concatenate([np.zeros(50), np.random.default_rng(0).lognormal(8, 1, 5000)])
+    sketch = QuantileSketch(0.01).add(np.append(values, np.nan))
+    assert sketch.count == len(values)
+    for q in np.linspace(0, 1, 41):
+        exact = np.quantile(values, q, method='lower')
+        assert abs(sketch.quantile(q) - exact) <= 0.01 * exact
+
+
+def test_merge_equals_sketch_of_all_values():
+    from app.sketch import QuantileSketch
+
+    values = np.random.default_rng(1).lognormal(7, 1.5, 3000)
+    merged = QuantileSketch(0.02).add(values[:1000]).merge(QuantileSketch(0.02).add(values[1000:]))
+    assert merged.to_dict() == QuantileSketch(0.02).add(values).to_dict()
+    assert QuantileSketch(0.02).merge(QuantileSketch(0.02)).quantile(0.5) is None
@@ -0,0 +1,82 @@
+def test_refresh_does_not_keep_the_raw_frame(dataset):
+    from app.dataset import DATASET
+    from app.trainer import ModelTrainer
+
+    trainer = ModelTrainer()
+    assert trainer.refresh()
+    assert trainer.current.version == DATASET.version
+    assert DATASET.stats()["rows"] is None
+
+
+def test_refresh_does_not_save_models_under_a_stale_version(dataset, monkeypatch):
+    from app.artifacts import load_artifact
+    from app.dataset import DATASET, append_responses
+    from app.trainer import ModelTrainer
+    from tests.test_responses import RESPONSE
+
+    # The dataset changes after the trainer read its version, before it reads the frame
+    stale = DATASET.version
+    snapshot = DATASET.snapshot
+
+    def changed_snapshot():
+        append_responses([RESPONSE], dataset)
+        return snapshot()
+
+    monkeypatch.setattr(DATASET, 'snapshot', changed_snapshot)
+    trainer = ModelTrainer()
+    assert not trainer.refresh()
+    assert trainer.current is None and trainer.failures == 0
+    assert load_artifact('expense_model', stale) is None
+
+    monkeypatch.setattr(DATASET, 'snapshot', snapshot)
+    assert trainer.refresh()
+    assert trainer.current.version == DATASET.version
+
+
+def test_warm_refresh_does_not_read_the_frame(dataset, monkeypatch):
+    from app.dataset import DATASET
+    from app.trainer import ModelTrainer
+
+    assert ModelTrainer().refresh()  # Trains and saves the artifacts
+
+    def unexpected_read(path):
+        raise AssertionError("The survey frame was read although the artifacts exist")
+
+    monkeypatch.setattr(DATASET, 'reader', unexpected_read)
+    trainer = ModelTrainer()
+    assert trainer.refresh()
+    assert trainer.current.version == DATASET.version
+
+
+def test_create_app_starts_the_trainer_without_blocking_requests(dataset, monkeypatch):
+    import threading
+    import time
+
+    from app import create_app
+    from app.trainer import TRAINER
+
+    monkeypatch.setattr(TRAINER, 'current', None)
+    app = create_app()
+    assert TRAINER.current is None and TRAINER._thread is None  # CLI commands do not train
+
+    # Training takes until `trained` is set
+    trained = threading.Event()
+    refresh = TRAINER.refresh
+    monkeypatch.setattr(TRAINER, 'refresh', lambda: trained.wait(10) and refresh())
+
+    client = app.test_client()
+    try:
+        assert client.get('/healthz').status_code == 200
+        assert TRAINER._thread is None
+        assert client.get('/readyz').status_code == 503
+        assert client.post('/submit_sweep', json={"salary": 8000, "family_status": "Single"}).status_code == 503
+        assert TRAINER._thread is not None
+
+        trained.set()
+        deadline = time.monotonic() + 10
+        while TRAINER.current is None and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert client.get('/readyz').status_code == 200
+    finally:
+        trained.set()
+        TRAINER.stop()
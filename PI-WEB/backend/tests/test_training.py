@@ -0,0 +1,21 @@
+import numpy as np
+import pytest
+
+
+@pytest.mark.parametrize('balance', ['upsample', 'priors'])
+def test_region_model_has_uniform_priors(dataset, balance):
+    from app.dataset import read_columnar
+    from app.utils import train_region_model
+
+    model = train_region_model(read_columnar(dataset), balance=balance)
+    assert np.allclose(model.priors, 1 / len(model.classes_))
+
+
+def test_balance_indexes_is_exact_and_seeded():
+    from app.training import balance_indexes
+
+    labels = np.repeat([0, 1, 2], [50, 7, 1])
+    indexes = balance_indexes(labels, seed=3)
+    assert np.array_equal(np.bincount(labels[indexes]), [50, 50, 50])
+    assert np.array_equal(indexes[:len(labels)], np.arange(len(labels)))
+    assert np.array_equal(indexes, balance_indexes(labels, seed=3))
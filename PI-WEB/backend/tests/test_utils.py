@@ -0,0 +1,54 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+
+def test_parse_currency_series():
+    from app.utils import parse_currency_series
+
+    values = ['500-1000 dh', '300 - 400', 'Plus de 2500 dh', 'Moins de 500', '0 dh', ' 12.5 DH ', '1200', 1500, None, np.nan]
+    parsed = parse_currency_series(values)
+    assert parsed[:8].tolist() == [750.0, 350.0, 2500.0, 500.0, 0.0, 12.5, 1200.0, 1500.0]
+    assert parsed[8:].isna().all()
+
+
+def test_parse_currency_series_fallback():
+    from app.utils import parse_currency_series
+
+    assert parse_currency_series(['abc', '100']).tolist() == [0.0, 100.0]
+    assert np.isnan(parse_currency_series(['abc'], fallback=np.nan)[0])
+    with pytest.raises(ValueError, match='abc'):
+        parse_currency_series(['abc', '100'], fallback='raise')
+
+
+def test_parse_currency_series_keeps_the_index():
+    from app.utils import parse_currency_series
+
+    for values in (pd.Series([1, 2], index=[5, 7], name='n'), pd.Series(['1-3', '2'], index=[5, 7], name='n')):
+        parsed = parse_currency_series(values)
+        assert parsed.index.tolist() == [5, 7] and parsed.name == 'n' and parsed.dtype == float
+
+
+def test_averages_without_answers_are_none():
+    from app.utils import AVERAGE_COLUMNS, averages_from_aggregates
+
+    n = len(AVERAGE_COLUMNS)
+    table = averages_from_aggregates({
+        ('Fès-Meknès', 'Single'): {"rows": 2, "sums": [100.0] + [float('nan')] * (n - 1), "counts": [2] + [1] * (n - 1)},
+        ('Fès-Meknès', 'Married'): {"rows": 1, "sums": [0.0] * n, "counts": [0] * n},
+    })
+    assert list(table[('Fès-Meknès', 'Single')].values()) == [50.0] + [None] * (n - 1)
+    assert table[('Fès-Meknès', 'Married')] is None
+    assert table[('Drâa-Tafilalet', 'Single')] is None
+
+
+def test_convert_currency_to_avg_matches_the_series():
+    from app.utils import convert_currency_to_avg, parse_currency_series
+
+    values = ['500-1000 dh', '300 - 400', 'Plus de 2500 dh', 'Moins de 500', '0 dh', ' 12.5 DH ', '1200', 'nan', 'abc',
+              1500, 12.5, None, np.nan, pd.NA]
+    for fallback in (0.0, np.nan):
+        expected = parse_currency_series(values, fallback=fallback).tolist()
+        assert [convert_currency_to_avg(value, fallback) for value in values] == pytest.approx(expected, nan_ok=True)
+    with pytest.raises(ValueError, match='abc'):
+        convert_currency_to_avg('abc', fallback='raise')